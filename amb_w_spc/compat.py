@@ -3,6 +3,19 @@ Compatibility layer for Frappe v15-v16 compatibility
 """
 import frappe
 from datetime import datetime, timedelta
+from frappe.model.document import Document
+
+def _parse_datetime(value):
+    """
+    Parse a datetime string, trying the C-implemented ISO parser first and
+    falling back to frappe.utils.get_datetime for other formats
+    """
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return frappe.utils.get_datetime(value)
+    return value
 
 # For Frappe v15 compatibility - add functions that were removed in v16
 def add_minutes(timestamp, minutes):
@@ -10,27 +23,104 @@ def add_minutes(timestamp, minutes):
     Compatibility function for Frappe v15
     In v16, this was removed and replaced with frappe.utils.add_to_date
     """
-    if isinstance(timestamp, str):
-        timestamp = frappe.utils.get_datetime(timestamp)
-    return timestamp + timedelta(minutes=minutes)
+    return _parse_datetime(timestamp) + timedelta(minutes=minutes)
 
 def add_to_date(date, days=0, hours=0, minutes=0, seconds=0):
     """
     Compatibility function that works in both v15 and v16
     """
-    if isinstance(date, str):
-        date = frappe.utils.get_datetime(date)
-    return date + timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    return _parse_datetime(date) + timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+_TYPE_NAMES = {float: "a float", int: "an integer"}
+
+def compile_schema_validator(schema, name="validate"):
+    """
+    Generate a flat validate function from a declarative field schema.
+
+    Each schema entry is ``(fieldname, label, required, options, fieldtype)``
+    where ``options`` is a set of allowed values (or None) and ``fieldtype``
+    is ``float``/``int`` (or None). Numeric values are coerced in place, so
+    e.g. an int or Decimal is accepted for a float field and "3.0" for an
+    int field, while 3.7 is rejected for an int field. All failures are
+    collected and reported in a single message instead of stopping at the
+    first one.
+    """
+    namespace = {"frappe": frappe}
+    lines = [f"def {name}(self):", "    errors = []"]
+    
+    for i, (fieldname, label, required, options, fieldtype) in enumerate(schema):
+        if not (required or options is not None or fieldtype is not None):
+            continue
+        lines.append(f"    value = self.{fieldname}")
+        if required:
+            lines += [
+                "    if not value:",
+                f"        errors.append({f'Field {label!r} is required.'!r})"
+            ]
+        if options is not None:
+            namespace[f"_options_{i}"] = options
+            # A required field already reported as missing skips the test
+            lines += [
+                f"    {'elif' if required else 'if value and'} value not in _options_{i}:",
+                f"        errors.append({f'Field {label!r} must be one of {sorted(options)}.'!r})"
+            ]
+        if fieldtype is not None:
+            namespace[f"_type_{i}"] = fieldtype
+            error = f"            errors.append({f'Field {label!r} must be {_TYPE_NAMES[fieldtype]}.'!r})"
+            # Values already of the right type (the common case) skip the
+            # conversion; type() is an exact check, so bool is still coerced
+            lines += [
+                f"    if value is not None and type(value) is not _type_{i}:",
+                "        try:",
+                "            number = float(value)",
+                "        except (TypeError, ValueError):",
+                "            number = None"
+            ]
+            if fieldtype is int:
+                # Integer fields take integral values of any type ("3.0",
+                # 3.0) but reject fractions rather than truncating them
+                lines += [
+                    "        if number is None or not number.is_integer():",
+                    error,
+                    "        else:",
+                    f"            self.{fieldname} = int(number)"
+                ]
+            else:
+                lines += [
+                    "        if number is None:",
+                    error,
+                    "        else:",
+                    f"            self.{fieldname} = number"
+                ]
+    
+    lines += ["    if errors:", "        frappe.throw(errors, as_list=True)"]
+    exec(compile("\n".join(lines), f"<schema {name}>", "exec"), namespace)
+    return namespace[name]
+
+class SPCValidatedDocument(Document):
+    """
+    Document whose validation is declared as a ``_schema`` class attribute
+    (see compile_schema_validator) and compiled once when the subclass is
+    defined. Subclasses that need extra checks can override validate() and
+    call self.validate_schema().
+    """
+    _schema = ()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.validate_schema = compile_schema_validator(cls._schema, "validate_schema")
+        if "validate" not in cls.__dict__:
+            cls.validate = cls.validate_schema
 
 # Make these functions available in frappe.utils
 def patch_frappe_utils():
-    """Patch frappe.utils with missing v16 functions"""
+    """Patch frappe.utils with missing v16 functions (idempotent)"""
+    if getattr(frappe.utils, '_amb_patched', False):
+        return
+    
     if not hasattr(frappe.utils, 'add_minutes'):
         frappe.utils.add_minutes = add_minutes
     if not hasattr(frappe.utils, 'add_to_date'):
         frappe.utils.add_to_date = add_to_date
     
-    print("✅ Applied Frappe v15-v16 compatibility patch")
-
-# Apply the patch when this module is imported
-patch_frappe_utils()
+    frappe.utils._amb_patched = True
@@ -0,0 +1,32 @@
+"""
+Numeric kernel for SPC Data Point statistics.
+
+The kernel is JIT-compiled with Numba when it is installed; otherwise the
+same NumPy implementation runs interpreted.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional - fall back to plain NumPy
+    njit = None
+
+def _stats_kernel(a):
+    mean = a.mean()
+    range_value = np.ptp(a[-5:]) if a.size >= 5 else 0.0
+    moving_range = abs(a[-1] - a[-2]) if a.size >= 2 else 0.0
+    return mean, range_value, moving_range
+
+if njit is not None:
+    _stats_kernel = njit(cache=True)(_stats_kernel)
+
+def compute_stats(values):
+    """
+    Return ``(x_bar, range_value, moving_range)`` for a float64 array.
+
+    The range is taken over the last 5 values (subgroup) and the moving
+    range over the last 2; both are 0.0 when the window is too short.
+    """
+    mean, range_value, moving_range = _stats_kernel(values)
+    return float(mean), float(range_value), float(moving_range)
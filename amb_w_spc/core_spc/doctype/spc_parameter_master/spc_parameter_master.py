@@ -15,3 +15,7 @@ class SpcParameterMaster(Document):
             frappe.throw("Field 'Data Type / Tipo de Dato' must be one of ['Numeric', 'Text'].")
         if self.default_precision is not None and not isinstance(self.default_precision, int):
             frappe.throw("Field 'Default Precision / Precisión por Defecto' must be an integer.")
+
+def on_doctype_update():
+    # Backs the duplicate parameter code check in spc_server_validations
+    frappe.db.add_index("SPC Parameter Master", ["parameter_code", "company"])
@@ -61,3 +61,7 @@ class SpcSpecification(Document):
             frappe.throw("Field 'Sampling Plan / Plan de Muestreo' must be one of ['100% Inspection', 'Statistical Sampling', 'Skip Lot', 'Reduced Inspection'].")
         if self.inspection_frequency and self.inspection_frequency not in ['Every Unit', 'Every Hour', 'Every Shift', 'Daily', 'Weekly', 'Batch Based']:
             frappe.throw("Field 'Inspection Frequency / Frecuencia de Inspección' must be one of ['Every Unit', 'Every Hour', 'Every Shift', 'Daily', 'Weekly', 'Batch Based'].")
+
+def on_doctype_update():
+    # Backs the overlapping active specification check in spc_server_validations
+    frappe.db.add_index("SPC Specification", ["parameter", "status"])
@@ -3,38 +3,74 @@
 
 import frappe
 from frappe import _
+from frappe.desk.doctype.notification_log.notification_log import enqueue_create_notification
 from frappe.utils import flt, getdate, nowdate
-import statistics
 import math
+import re
+from datetime import date, datetime
+from itertools import chain, compress
+
+import numpy as np
+
+from amb_w_spc.core_spc._spc_stats import compute_stats
+
+# Redis rolling window of recent Valid measured values per parameter
+RECENT_POINTS_KEY = "spc:recent:{0}"
+RECENT_POINTS_WINDOW = 29
+# Seconds before a warmed window is dropped and reloaded from the database,
+# which bounds staleness from writes that bypass update_recent_points_cache
+RECENT_POINTS_TTL = 300
+
+EMAIL_ALERT_METHODS = frozenset({"Email", "All Methods"})
+
+PARAMETER_CODE_RE = re.compile(r'^[A-Za-z0-9_\-]+\Z')
+
+# Data point limit checks, in (UCL, LCL, USL, LSL) order
+LIMIT_SIGNS = np.array([1.0, -1.0, 1.0, -1.0])
+LIMIT_NOTES = (
+    "Above Upper Control Limit",
+    "Below Lower Control Limit",
+    "Above Upper Specification Limit",
+    "Below Lower Specification Limit"
+)
 
 class SPCValidationError(frappe.ValidationError):
     pass
 
+# Translated messages, keyed by (language, source message)
+_translations = {}
+
+def _t(message):
+    """Translate a validation message once per language and reuse it"""
+    key = (frappe.local.lang, message)
+    translated = _translations.get(key)
+    if translated is None:
+        translated = _translations[key] = _(message)
+    return translated
+
 def validate_spc_parameter_master(doc, method):
     """Server-side validation for SPC Parameter Master"""
     
     # Validate parameter code format
     if doc.parameter_code:
-        import re
-        if not re.match(r'^[A-Za-z0-9_-]+$', doc.parameter_code):
-            frappe.throw(_("Parameter Code must contain only letters, numbers, hyphens, and underscores"),
+        if not PARAMETER_CODE_RE.match(doc.parameter_code):
+            frappe.throw(_t("Parameter Code must contain only letters, numbers, hyphens, and underscores"),
                         SPCValidationError)
     
     # Check for duplicate parameter codes within company
-    existing = frappe.get_all("SPC Parameter Master", 
-                             filters={
-                                 "parameter_code": doc.parameter_code,
-                                 "company": doc.company,
-                                 "name": ["!=", doc.name]
-                             })
-    if existing:
-        frappe.throw(_("Parameter Code {0} already exists for company {1}").format(
+    # (indexed on (parameter_code, company); exists() stops at the first match)
+    if frappe.db.exists("SPC Parameter Master", {
+        "parameter_code": doc.parameter_code,
+        "company": doc.company,
+        "name": ["!=", doc.name or ""]
+    }):
+        frappe.throw(_t("Parameter Code {0} already exists for company {1}").format(
             doc.parameter_code, doc.company), SPCValidationError)
     
     # Validate precision for numeric types
     if doc.data_type == "Numeric":
         if not doc.default_precision or doc.default_precision < 0:
-            frappe.throw(_("Default Precision must be specified and >= 0 for Numeric data types"),
+            frappe.throw(_t("Default Precision must be specified and >= 0 for Numeric data types"),
                         SPCValidationError)
 
 def validate_spc_data_point(doc, method):
@@ -42,28 +78,39 @@ def validate_spc_data_point(doc, method):
     
     # Validate measurement value
     if doc.measured_value is None:
-        frappe.throw(_("Measured Value is required"), SPCValidationError)
+        frappe.throw(_t("Measured Value is required"), SPCValidationError)
+    
+    # Coerce measured value and limits once for all checks below
+    measured_val = flt(doc.measured_value)
+    ucl = flt(doc.upper_control_limit)
+    lcl = flt(doc.lower_control_limit)
+    usl = flt(doc.upper_spec_limit)
+    lsl = flt(doc.lower_spec_limit)
     
     # Validate control limits
-    if doc.upper_control_limit and doc.lower_control_limit:
-        if flt(doc.upper_control_limit) <= flt(doc.lower_control_limit):
-            frappe.throw(_("Upper Control Limit must be greater than Lower Control Limit"),
-                        SPCValidationError)
+    if ucl and lcl and ucl <= lcl:
+        frappe.throw(_t("Upper Control Limit must be greater than Lower Control Limit"),
+                    SPCValidationError)
     
     # Validate specification limits
-    if doc.upper_spec_limit and doc.lower_spec_limit:
-        if flt(doc.upper_spec_limit) <= flt(doc.lower_spec_limit):
-            frappe.throw(_("Upper Specification Limit must be greater than Lower Specification Limit"),
-                        SPCValidationError)
+    if usl and lsl and usl <= lsl:
+        frappe.throw(_t("Upper Specification Limit must be greater than Lower Specification Limit"),
+                    SPCValidationError)
     
     # Auto-calculate statistical values
-    calculate_statistical_values(doc)
+    calculate_statistical_values(doc, measured_val)
     
     # Auto-validate status
-    auto_validate_data_point_status(doc)
-    
-    # Check for alerts
-    check_spc_alerts(doc)
+    auto_validate_data_point_status(doc, measured_val, ucl, lcl, usl, lsl)
+    
+    # Check for alerts in the background once the data point is committed
+    if doc.status == "Invalid":
+        frappe.enqueue(
+            "amb_w_spc.core_spc.spc_server_validations.check_spc_alerts_bg",
+            queue="short",
+            enqueue_after_commit=True,
+            doc_name=doc.name
+        )
 
 def validate_spc_specification(doc, method):
     """Server-side validation for SPC Specification"""
@@ -71,7 +118,7 @@ def validate_spc_specification(doc, method):
     # Validate tolerance values
     if doc.tolerance_plus and doc.tolerance_minus:
         if flt(doc.tolerance_plus) <= 0 or flt(doc.tolerance_minus) <= 0:
-            frappe.throw(_("Tolerance values must be positive"), SPCValidationError)
+            frappe.throw(_t("Tolerance values must be positive"), SPCValidationError)
     
     # Calculate specification limits from target and tolerance
     if doc.target_value and doc.tolerance_plus and doc.tolerance_minus:
@@ -81,112 +128,163 @@ def validate_spc_specification(doc, method):
     # Validate specification limits
     if doc.upper_spec_limit and doc.lower_spec_limit:
         if flt(doc.upper_spec_limit) <= flt(doc.lower_spec_limit):
-            frappe.throw(_("Upper Specification Limit must be greater than Lower Specification Limit"),
+            frappe.throw(_t("Upper Specification Limit must be greater than Lower Specification Limit"),
                         SPCValidationError)
     
     # Validate control limits are within spec limits
     if doc.upper_control_limit and doc.upper_spec_limit:
         if flt(doc.upper_control_limit) > flt(doc.upper_spec_limit):
-            frappe.throw(_("Upper Control Limit cannot exceed Upper Specification Limit"),
+            frappe.throw(_t("Upper Control Limit cannot exceed Upper Specification Limit"),
                         SPCValidationError)
     
     if doc.lower_control_limit and doc.lower_spec_limit:
         if flt(doc.lower_control_limit) < flt(doc.lower_spec_limit):
-            frappe.throw(_("Lower Control Limit cannot be below Lower Specification Limit"),
+            frappe.throw(_t("Lower Control Limit cannot be below Lower Specification Limit"),
                         SPCValidationError)
     
     # Validate date ranges
     if doc.valid_from and doc.valid_to:
-        if getdate(doc.valid_to) < getdate(doc.valid_from):
-            frappe.throw(_("Valid To date cannot be earlier than Valid From date"),
+        if _to_date(doc.valid_to) < _to_date(doc.valid_from):
+            frappe.throw(_t("Valid To date cannot be earlier than Valid From date"),
                         SPCValidationError)
     
     # Check for overlapping active specifications
     check_overlapping_specifications(doc)
 
+def _to_date(value):
+    """Return value as a date, only parsing it when the ORM has not typed it yet"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return getdate(value)
+
 def validate_spc_control_chart(doc, method):
     """Server-side validation for SPC Control Chart"""
     
     # Validate sample size
     if doc.sample_size and doc.sample_size <= 0:
-        frappe.throw(_("Sample Size must be greater than 0"), SPCValidationError)
+        frappe.throw(_t("Sample Size must be greater than 0"), SPCValidationError)
     
     # Validate sigma level
     if doc.sigma_level and (doc.sigma_level <= 0 or doc.sigma_level > 6):
-        frappe.throw(_("Sigma Level must be between 0 and 6"), SPCValidationError)
+        frappe.throw(_t("Sigma Level must be between 0 and 6"), SPCValidationError)
     
     # Validate data points to display
     if doc.data_points_to_display and doc.data_points_to_display <= 0:
-        frappe.throw(_("Data Points to Display must be greater than 0"), SPCValidationError)
+        frappe.throw(_t("Data Points to Display must be greater than 0"), SPCValidationError)
     
     # Validate refresh interval
     if doc.auto_refresh and doc.refresh_interval and doc.refresh_interval <= 0:
-        frappe.throw(_("Refresh Interval must be greater than 0"), SPCValidationError)
+        frappe.throw(_t("Refresh Interval must be greater than 0"), SPCValidationError)
 
-def calculate_statistical_values(doc):
+def calculate_statistical_values(doc, measured_val):
     """Calculate statistical values for SPC Data Point"""
     
     if not doc.parameter:
         return
     
-    # Get recent data points for the same parameter (last 30 points)
+    # Get recent data points for the same parameter (29 + current = 30 total)
+    recent_values = get_recent_values(doc)
+    
+    # Oldest first, with the current value last
+    values = np.fromiter(
+        chain(reversed(recent_values), (measured_val,)),
+        dtype=np.float64,
+        count=len(recent_values) + 1
+    )
+    
+    if len(values) >= 2:
+        # X-bar (mean), subgroup range and moving range in one kernel call
+        x_bar, range_value, moving_range = compute_stats(values)
+        doc.x_bar = x_bar
+        doc.moving_range = moving_range
+        
+        # Range is only meaningful once we have a full subgroup of 5
+        if len(values) >= 5:
+            doc.range_value = range_value
+
+def get_recent_values(doc):
+    """
+    Return the measured values of the last Valid data points for the
+    parameter, newest first.
+
+    New points read the rolling window kept in Redis by
+    update_recent_points_cache, which expires RECENT_POINTS_TTL seconds
+    after it is loaded; edits of saved points (which may already be
+    part of the window) and cache misses fall back to the database.
+    """
+    if not doc.is_new():
+        return _get_recent_values_from_db(doc)
+    
+    cache = frappe.cache()
+    key = RECENT_POINTS_KEY.format(doc.parameter)
+    cached = cache.lrange(key, 0, RECENT_POINTS_WINDOW - 1)
+    if cached:
+        return [flt(value) for value in cached]
+    
+    # Warm the window so subsequent inserts skip the query. Replacing it in
+    # one MULTI/EXEC means concurrent warmers overwrite rather than append
+    # to each other's values.
+    values = _get_recent_values_from_db(doc)
+    if values:
+        redis_key = cache.make_key(key)
+        pipe = cache.pipeline()
+        pipe.delete(redis_key)
+        pipe.rpush(redis_key, *values)
+        pipe.ltrim(redis_key, 0, RECENT_POINTS_WINDOW - 1)
+        pipe.expire(redis_key, RECENT_POINTS_TTL)
+        pipe.execute()
+    return values
+
+def _get_recent_values_from_db(doc):
     recent_points = frappe.get_all("SPC Data Point",
                                   filters={
                                       "parameter": doc.parameter,
                                       "status": "Valid",
                                       "name": ["!=", doc.name or ""]
                                   },
-                                  fields=["measured_value", "timestamp"],
+                                  fields=["measured_value"],
                                   order_by="timestamp desc",
-                                  limit=29)  # Get 29 + current = 30 total
-    
-    values = [flt(point.measured_value) for point in recent_points]
-    values.append(flt(doc.measured_value))  # Add current value
-    
-    if len(values) >= 2:
-        # Calculate X-bar (mean)
-        doc.x_bar = statistics.mean(values)
-        
-        # Calculate Range (if we have subgroups)
-        if len(values) >= 5:
-            # Take last 5 values as subgroup
-            subgroup = values[-5:]
-            doc.range_value = max(subgroup) - min(subgroup)
-        
-        # Calculate Moving Range
-        if len(values) >= 2:
-            moving_ranges = [abs(values[i] - values[i-1]) for i in range(1, len(values))]
-            doc.moving_range = moving_ranges[-1] if moving_ranges else 0
+                                  limit=RECENT_POINTS_WINDOW)
+    return [flt(point.measured_value) for point in recent_points]
 
-def auto_validate_data_point_status(doc):
-    """Auto-validate SPC Data Point status based on limits"""
-    
-    status = "Valid"
-    notes = []
+def update_recent_points_cache(doc, method):
+    """Keep the Redis rolling window of recent values in sync (on_update / on_trash)"""
     
-    measured_val = flt(doc.measured_value)
-    
-    # Check control limits
-    if doc.upper_control_limit and measured_val > flt(doc.upper_control_limit):
-        status = "Invalid"
-        notes.append("Above Upper Control Limit")
-    
-    if doc.lower_control_limit and measured_val < flt(doc.lower_control_limit):
-        status = "Invalid"
-        notes.append("Below Lower Control Limit")
+    if not doc.parameter:
+        return
     
-    # Check specification limits
-    if doc.upper_spec_limit and measured_val > flt(doc.upper_spec_limit):
-        status = "Invalid"
-        notes.append("Above Upper Specification Limit")
+    cache = frappe.cache()
+    key = RECENT_POINTS_KEY.format(doc.parameter)
+    
+    if method == "on_update" and doc.flags.in_insert:
+        # Only extend a window that has already been warmed from the database
+        if doc.status == "Valid" and cache.llen(key):
+            cache.lpush(key, flt(doc.measured_value))
+            cache.ltrim(key, 0, RECENT_POINTS_WINDOW - 1)
+    else:
+        # Edited or deleted points invalidate the window; it is rebuilt on next insert
+        invalidate_recent_points_cache(doc.parameter)
+
+def invalidate_recent_points_cache(parameter):
+    """Drop the recent values window of a parameter, e.g. after data points
+    were written without going through the document hooks"""
+    frappe.cache().delete_value(RECENT_POINTS_KEY.format(parameter))
+
+def auto_validate_data_point_status(doc, measured_val, ucl, lcl, usl, lsl):
+    """Auto-validate SPC Data Point status based on limits (already coerced to float)"""
     
-    if doc.lower_spec_limit and measured_val < flt(doc.lower_spec_limit):
-        status = "Invalid"
-        notes.append("Below Lower Specification Limit")
+    # Control and specification limits compared in one vector operation;
+    # lower limits are negated so every check reads "signed value > limit"
+    # and unset limits become +inf so they never trip
+    limits = np.array([ucl or np.inf, -lcl or np.inf, usl or np.inf, -lsl or np.inf])
+    violations = LIMIT_SIGNS * measured_val > limits
+    notes = list(compress(LIMIT_NOTES, violations))
     
     # Update status and notes
-    doc.status = status
-    if notes and status == "Invalid":
+    doc.status = "Invalid" if notes else "Valid"
+    if notes:
         doc.validation_notes = ", ".join(notes)
 
 def check_overlapping_specifications(doc):
@@ -195,7 +293,7 @@ def check_overlapping_specifications(doc):
     if doc.status != "Active":
         return
     
-    # Find overlapping specifications
+    # Find overlapping specifications (indexed on (parameter, status))
     filters = {
         "parameter": doc.parameter,
         "status": "Active",
@@ -208,10 +306,8 @@ def check_overlapping_specifications(doc):
     if doc.valid_to:
         filters["valid_to"] = [">=", doc.valid_from]
     
-    overlapping = frappe.get_all("SPC Specification", filters=filters)
-    
-    if overlapping:
-        frappe.throw(_("An active specification already exists for parameter {0} in the specified date range").format(
+    if frappe.db.exists("SPC Specification", filters):
+        frappe.throw(_t("An active specification already exists for parameter {0} in the specified date range").format(
             doc.parameter), SPCValidationError)
 
 def check_spc_alerts(doc):
@@ -220,28 +316,30 @@ def check_spc_alerts(doc):
     if doc.status != "Invalid":
         return
     
-    # Get control charts for this parameter
-    charts = frappe.get_all("SPC Control Chart",
-                           filters={
-                               "parameter": doc.parameter,
-                               "status": "Active",
-                               "enable_alerts": 1
-                           },
-                           fields=["name", "chart_name"])
-    
-    # For each chart, check alert conditions and send notifications
-    for chart in charts:
-        send_spc_alert(chart.name, doc)
+    # Get the alert recipients of every active control chart for this parameter
+    recipients = frappe.db.sql("""
+        SELECT r.user, r.email, r.alert_method
+        FROM `tabSPC Control Chart` c
+        INNER JOIN `tabSPC Alert Recipient` r
+            ON r.parent = c.name AND r.parenttype = 'SPC Control Chart'
+        WHERE c.parameter = %s AND c.status = 'Active' AND c.enable_alerts = 1
+    """, doc.parameter, as_dict=True)
+    
+    # Notify all recipients in one fan-out
+    if recipients:
+        send_spc_alert(recipients, doc)
 
-def send_spc_alert(chart_name, data_point):
-    """Send SPC alert notifications"""
-    
-    # Get alert recipients for the chart
-    chart_doc = frappe.get_doc("SPC Control Chart", chart_name)
+def check_spc_alerts_bg(doc_name):
+    """Background job: re-fetch the saved data point and run check_spc_alerts"""
     
-    if not chart_doc.alert_recipients:
+    if not frappe.db.exists("SPC Data Point", doc_name):
         return
     
+    check_spc_alerts(frappe.get_doc("SPC Data Point", doc_name))
+
+def send_spc_alert(recipients, data_point):
+    """Send SPC alert notifications to the given alert recipient rows"""
+    
     # Prepare alert message
     subject = f"SPC Alert: {data_point.parameter} Out of Control"
     message = f"""
@@ -259,27 +357,32 @@ def send_spc_alert(chart_name, data_point):
     Please investigate and take corrective action.
     """
     
-    # Send notifications to recipients
-    for recipient in chart_doc.alert_recipients:
-        if recipient.alert_method in ["Email", "All Methods"]:
-            frappe.sendmail(
-                recipients=[recipient.email or recipient.user],
-                subject=subject,
-                message=message,
-                reference_doctype="SPC Data Point",
-                reference_name=data_point.name
-            )
-        
-        # Add notification to ERPNext notification system
-        frappe.get_doc({
-            "doctype": "Notification Log",
+    email_recipients = {r.email or r.user for r in recipients
+                        if r.alert_method in EMAIL_ALERT_METHODS and (r.email or r.user)}
+    users = {r.user for r in recipients if r.user}
+    
+    # Send one email to all recipients through the email queue (no inline SMTP)
+    if email_recipients:
+        frappe.sendmail(
+            recipients=sorted(email_recipients),
+            subject=subject,
+            message=message,
+            reference_doctype="SPC Data Point",
+            reference_name=data_point.name,
+            now=False
+        )
+    
+    # Add notifications to ERPNext notification system (created by a background job).
+    # Rows are not bulk-inserted: Notification Log.after_insert publishes the
+    # realtime bell update and the per-user email, which a raw INSERT would skip.
+    if users:
+        enqueue_create_notification(sorted(users), {
             "subject": subject,
             "email_content": message,
-            "for_user": recipient.user,
             "type": "Alert",
             "document_type": "SPC Data Point",
             "document_name": data_point.name
-        }).insert(ignore_permissions=True)
+        })
 
 # Hooks to add to your app's hooks.py file:
 """
@@ -288,7 +391,9 @@ doc_events = {
         "validate": "your_app.spc_validations.validate_spc_parameter_master"
     },
     "SPC Data Point": {
-        "validate": "your_app.spc_validations.validate_spc_data_point"
+        "validate": "your_app.spc_validations.validate_spc_data_point",
+        "on_update": "your_app.spc_validations.update_recent_points_cache",
+        "on_trash": "your_app.spc_validations.update_recent_points_cache"
     },
     "SPC Specification": {
         "validate": "your_app.spc_validations.validate_spc_specification"
@@ -1,25 +1,25 @@
 import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcAuditTrail(Document):
-    def validate(self):
-        if not self.record_id:
-            frappe.throw("Field 'Record ID' is required.")
-        if not self.timestamp:
-            frappe.throw("Field 'Timestamp' is required.")
-        if not self.user_id:
-            frappe.throw("Field 'User ID' is required.")
-        if not self.action_type:
-            frappe.throw("Field 'Action Type' is required.")
-        if self.action_type and self.action_type not in ['Create', 'Read', 'Update', 'Delete', 'Print', 'Export', 'Sign', 'Approve', 'Reject']:
-            frappe.throw("Field 'Action Type' must be one of ['Create', 'Read', 'Update', 'Delete', 'Print', 'Export', 'Sign', 'Approve', 'Reject'].")
-        if not self.table_name:
-            frappe.throw("Field 'Table Name' is required.")
-        if not self.record_name:
-            frappe.throw("Field 'Record Name' is required.")
-        if not self.ip_address:
-            frappe.throw("Field 'IP Address' is required.")
-        if not self.session_id:
-            frappe.throw("Field 'Session ID' is required.")
-        if self.backup_status and self.backup_status not in ['Pending', 'Completed', 'Failed']:
-            frappe.throw("Field 'Backup Status' must be one of ['Pending', 'Completed', 'Failed'].")
+_ACTION_TYPE_OPTIONS = frozenset({'Create', 'Read', 'Update', 'Delete', 'Print', 'Export', 'Sign', 'Approve', 'Reject'})
+_BACKUP_STATUS_OPTIONS = frozenset({'Pending', 'Completed', 'Failed'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('record_id', 'Record ID', True, None, None),
+    ('timestamp', 'Timestamp', True, None, None),
+    ('user_id', 'User ID', True, None, None),
+    ('action_type', 'Action Type', True, _ACTION_TYPE_OPTIONS, None),
+    ('table_name', 'Table Name', True, None, None),
+    ('record_name', 'Record Name', True, None, None),
+    ('ip_address', 'IP Address', True, None, None),
+    ('session_id', 'Session ID', True, None, None),
+    ('backup_status', 'Backup Status', False, _BACKUP_STATUS_OPTIONS, None),
+)
+
+class SpcAuditTrail(SPCValidatedDocument):
+    _schema = _SCHEMA
+
+def on_doctype_update():
+    # Covers the date-range GROUP BY in weekly_audit_trail_summary
+    frappe.db.add_index("SPC Audit Trail", ["timestamp", "action_type", "user_id"])
@@ -1,11 +1,14 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcBatchDeviation(Document):
-    def validate(self):
-        if not self.deviation_number:
-            frappe.throw("Field 'Deviation Number' is required.")
-        if self.impact and self.impact not in ['No Impact', 'Minor', 'Major', 'Critical']:
-            frappe.throw("Field 'Impact' must be one of ['No Impact', 'Minor', 'Major', 'Critical'].")
-        if self.resolution_status and self.resolution_status not in ['Open', 'Resolved', 'Accepted']:
-            frappe.throw("Field 'Resolution Status' must be one of ['Open', 'Resolved', 'Accepted'].")
+_IMPACT_OPTIONS = frozenset({'No Impact', 'Minor', 'Major', 'Critical'})
+_RESOLUTION_STATUS_OPTIONS = frozenset({'Open', 'Resolved', 'Accepted'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('deviation_number', 'Deviation Number', True, None, None),
+    ('impact', 'Impact', False, _IMPACT_OPTIONS, None),
+    ('resolution_status', 'Resolution Status', False, _RESOLUTION_STATUS_OPTIONS, None),
+)
+
+class SpcBatchDeviation(SPCValidatedDocument):
+    _schema = _SCHEMA
@@ -1,15 +1,14 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcBatchParameter(Document):
-    def validate(self):
-        if not self.parameter_name:
-            frappe.throw("Field 'Parameter Name' is required.")
-        if not self.specification:
-            frappe.throw("Field 'Specification' is required.")
-        if not self.result:
-            frappe.throw("Field 'Result' is required.")
-        if not self.pass_fail:
-            frappe.throw("Field 'Pass/Fail' is required.")
-        if self.pass_fail and self.pass_fail not in ['Pass', 'Fail', 'Investigate']:
-            frappe.throw("Field 'Pass/Fail' must be one of ['Pass', 'Fail', 'Investigate'].")
+_PASS_FAIL_OPTIONS = frozenset({'Pass', 'Fail', 'Investigate'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('parameter_name', 'Parameter Name', True, None, None),
+    ('specification', 'Specification', True, None, None),
+    ('result', 'Result', True, None, None),
+    ('pass_fail', 'Pass/Fail', True, _PASS_FAIL_OPTIONS, None),
+)
+
+class SpcBatchParameter(SPCValidatedDocument):
+    _schema = _SCHEMA
@@ -1,15 +1,15 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcChangeControl(Document):
-    def validate(self):
-        if not self.change_control_number:
-            frappe.throw("Field 'Change Control Number' is required.")
-        if not self.change_description:
-            frappe.throw("Field 'Change Description' is required.")
-        if not self.change_type:
-            frappe.throw("Field 'Change Type' is required.")
-        if self.change_type and self.change_type not in ['Temporary', 'Permanent', 'Emergency']:
-            frappe.throw("Field 'Change Type' must be one of ['Temporary', 'Permanent', 'Emergency'].")
-        if self.approval_status and self.approval_status not in ['Pending', 'Approved', 'Rejected']:
-            frappe.throw("Field 'Approval Status' must be one of ['Pending', 'Approved', 'Rejected'].")
+_CHANGE_TYPE_OPTIONS = frozenset({'Temporary', 'Permanent', 'Emergency'})
+_APPROVAL_STATUS_OPTIONS = frozenset({'Pending', 'Approved', 'Rejected'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('change_control_number', 'Change Control Number', True, None, None),
+    ('change_description', 'Change Description', True, None, None),
+    ('change_type', 'Change Type', True, _CHANGE_TYPE_OPTIONS, None),
+    ('approval_status', 'Approval Status', False, _APPROVAL_STATUS_OPTIONS, None),
+)
+
+class SpcChangeControl(SPCValidatedDocument):
+    _schema = _SCHEMA
@@ -1,33 +1,23 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SPCDeviation(Document):
-    def validate(self):
-        if not self.deviation_number:
-            frappe.throw("Field 'Deviation Number' is required.")
-        if not self.deviation_type:
-            frappe.throw("Field 'Deviation Type' is required.")
-        if self.deviation_type and self.deviation_type not in ['Manufacturing', 'Quality Control', 'Documentation', 'Equipment', 'Personnel', 'Environmental', 'System', 'Other']:
-            frappe.throw("Field 'Deviation Type' must be one of ['Manufacturing', 'Quality Control', 'Documentation', 'Equipment', 'Personnel', 'Environmental', 'System', 'Other'].")
-        if not self.severity:
-            frappe.throw("Field 'Severity' is required.")
-        if self.severity and self.severity not in ['Critical', 'Major', 'Minor']:
-            frappe.throw("Field 'Severity' must be one of ['Critical', 'Major', 'Minor'].")
-        if not self.plant:
-            frappe.throw("Field 'Plant' is required.")
-        if not self.department:
-            frappe.throw("Field 'Department' is required.")
-        if not self.reported_by:
-            frappe.throw("Field 'Reported By' is required.")
-        if not self.occurrence_date:
-            frappe.throw("Field 'Occurrence Date' is required.")
-        if not self.detection_date:
-            frappe.throw("Field 'Detection Date' is required.")
-        if not self.deviation_description:
-            frappe.throw("Field 'Deviation Description' is required.")
-        if not self.impact_assessment:
-            frappe.throw("Field 'Impact Assessment' is required.")
-        if not self.deviation_status:
-            frappe.throw("Field 'Deviation Status' is required.")
-        if self.deviation_status and self.deviation_status not in ['Open', 'Under Investigation', 'Pending CAPA', 'CAPAs In Progress', 'Pending QA Review', 'Closed', 'Cancelled']:
-            frappe.throw("Field 'Deviation Status' must be one of ['Open', 'Under Investigation', 'Pending CAPA', 'CAPAs In Progress', 'Pending QA Review', 'Closed', 'Cancelled'].")
+_DEVIATION_TYPE_OPTIONS = frozenset({'Manufacturing', 'Quality Control', 'Documentation', 'Equipment', 'Personnel', 'Environmental', 'System', 'Other'})
+_SEVERITY_OPTIONS = frozenset({'Critical', 'Major', 'Minor'})
+_DEVIATION_STATUS_OPTIONS = frozenset({'Open', 'Under Investigation', 'Pending CAPA', 'CAPAs In Progress', 'Pending QA Review', 'Closed', 'Cancelled'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('deviation_number', 'Deviation Number', True, None, None),
+    ('deviation_type', 'Deviation Type', True, _DEVIATION_TYPE_OPTIONS, None),
+    ('severity', 'Severity', True, _SEVERITY_OPTIONS, None),
+    ('plant', 'Plant', True, None, None),
+    ('department', 'Department', True, None, None),
+    ('reported_by', 'Reported By', True, None, None),
+    ('occurrence_date', 'Occurrence Date', True, None, None),
+    ('detection_date', 'Detection Date', True, None, None),
+    ('deviation_description', 'Deviation Description', True, None, None),
+    ('impact_assessment', 'Impact Assessment', True, None, None),
+    ('deviation_status', 'Deviation Status', True, _DEVIATION_STATUS_OPTIONS, None),
+)
+
+class SPCDeviation(SPCValidatedDocument):
+    _schema = _SCHEMA
@@ -1,35 +1,25 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SPCElectronicSignature(Document):
-    def validate(self):
-        if not self.signature_id:
-            frappe.throw("Field 'Signature ID' is required.")
-        if not self.document_type:
-            frappe.throw("Field 'Document Type' is required.")
-        if not self.document_name:
-            frappe.throw("Field 'Document Name' is required.")
-        if not self.signer_name:
-            frappe.throw("Field 'Signer Name' is required.")
-        if not self.signer_role:
-            frappe.throw("Field 'Signer Role' is required.")
-        if not self.signature_meaning:
-            frappe.throw("Field 'Signature Meaning' is required.")
-        if self.signature_meaning and self.signature_meaning not in ['Authored', 'Reviewed', 'Approved', 'Witnessed', 'Responsible', 'Delegate']:
-            frappe.throw("Field 'Signature Meaning' must be one of ['Authored', 'Reviewed', 'Approved', 'Witnessed', 'Responsible', 'Delegate'].")
-        if not self.signature_date:
-            frappe.throw("Field 'Signature Date' is required.")
-        if not self.signature_method:
-            frappe.throw("Field 'Signature Method' is required.")
-        if self.signature_method and self.signature_method not in ['Password', 'Biometric', 'Token', 'Digital Certificate', 'Multi-Factor']:
-            frappe.throw("Field 'Signature Method' must be one of ['Password', 'Biometric', 'Token', 'Digital Certificate', 'Multi-Factor'].")
-        if not self.user_credentials_verified:
-            frappe.throw("Field 'User Credentials Verified' is required.")
-        if not self.authorization_level:
-            frappe.throw("Field 'Authorization Level' is required.")
-        if self.authorization_level and self.authorization_level not in ['Level 1 - Basic', 'Level 2 - Intermediate', 'Level 3 - Advanced', 'Level 4 - Critical']:
-            frappe.throw("Field 'Authorization Level' must be one of ['Level 1 - Basic', 'Level 2 - Intermediate', 'Level 3 - Advanced', 'Level 4 - Critical'].")
-        if not self.cfr_part11_compliant:
-            frappe.throw("Field 'CFR Part 11 Compliant' is required.")
-        if self.verification_method and self.verification_method not in ['Digital Certificate', 'Hash Validation', 'Timestamp Verification', 'Biometric Match', 'Database Verification']:
-            frappe.throw("Field 'Verification Method' must be one of ['Digital Certificate', 'Hash Validation', 'Timestamp Verification', 'Biometric Match', 'Database Verification'].")
+_SIGNATURE_MEANING_OPTIONS = frozenset({'Authored', 'Reviewed', 'Approved', 'Witnessed', 'Responsible', 'Delegate'})
+_SIGNATURE_METHOD_OPTIONS = frozenset({'Password', 'Biometric', 'Token', 'Digital Certificate', 'Multi-Factor'})
+_AUTHORIZATION_LEVEL_OPTIONS = frozenset({'Level 1 - Basic', 'Level 2 - Intermediate', 'Level 3 - Advanced', 'Level 4 - Critical'})
+_VERIFICATION_METHOD_OPTIONS = frozenset({'Digital Certificate', 'Hash Validation', 'Timestamp Verification', 'Biometric Match', 'Database Verification'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('signature_id', 'Signature ID', True, None, None),
+    ('document_type', 'Document Type', True, None, None),
+    ('document_name', 'Document Name', True, None, None),
+    ('signer_name', 'Signer Name', True, None, None),
+    ('signer_role', 'Signer Role', True, None, None),
+    ('signature_meaning', 'Signature Meaning', True, _SIGNATURE_MEANING_OPTIONS, None),
+    ('signature_date', 'Signature Date', True, None, None),
+    ('signature_method', 'Signature Method', True, _SIGNATURE_METHOD_OPTIONS, None),
+    ('user_credentials_verified', 'User Credentials Verified', True, None, None),
+    ('authorization_level', 'Authorization Level', True, _AUTHORIZATION_LEVEL_OPTIONS, None),
+    ('cfr_part11_compliant', 'CFR Part 11 Compliant', True, None, None),
+    ('verification_method', 'Verification Method', False, _VERIFICATION_METHOD_OPTIONS, None),
+)
+
+class SPCElectronicSignature(SPCValidatedDocument):
+    _schema = _SCHEMA
@@ -1,15 +1,15 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcEnvironment(Document):
-    def validate(self):
-        if not self.parameter:
-            frappe.throw("Field 'Parameter' is required.")
-        if self.parameter and self.parameter not in ['Temperature', 'Humidity', 'Pressure', 'Air Quality', 'Cleanroom Grade', 'Particle Count', 'Other']:
-            frappe.throw("Field 'Parameter' must be one of ['Temperature', 'Humidity', 'Pressure', 'Air Quality', 'Cleanroom Grade', 'Particle Count', 'Other'].")
-        if not self.specification:
-            frappe.throw("Field 'Specification' is required.")
-        if not self.actual_value:
-            frappe.throw("Field 'Actual Value' is required.")
-        if self.monitoring_frequency and self.monitoring_frequency not in ['Continuous', 'Hourly', 'Daily', 'Batch Start', 'Batch End']:
-            frappe.throw("Field 'Monitoring Frequency' must be one of ['Continuous', 'Hourly', 'Daily', 'Batch Start', 'Batch End'].")
+_PARAMETER_OPTIONS = frozenset({'Temperature', 'Humidity', 'Pressure', 'Air Quality', 'Cleanroom Grade', 'Particle Count', 'Other'})
+_MONITORING_FREQUENCY_OPTIONS = frozenset({'Continuous', 'Hourly', 'Daily', 'Batch Start', 'Batch End'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('parameter', 'Parameter', True, _PARAMETER_OPTIONS, None),
+    ('specification', 'Specification', True, None, None),
+    ('actual_value', 'Actual Value', True, None, None),
+    ('monitoring_frequency', 'Monitoring Frequency', False, _MONITORING_FREQUENCY_OPTIONS, None),
+)
+
+class SpcEnvironment(SPCValidatedDocument):
+    _schema = _SCHEMA
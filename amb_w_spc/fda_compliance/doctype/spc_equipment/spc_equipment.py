@@ -1,15 +1,14 @@
-import frappe
-from frappe.model.document import Document
+from amb_w_spc.compat import SPCValidatedDocument
 
-class SpcEquipment(Document):
-    def validate(self):
-        if not self.equipment_id:
-            frappe.throw("Field 'Equipment ID' is required.")
-        if not self.equipment_name:
-            frappe.throw("Field 'Equipment Name' is required.")
-        if not self.calibration_status:
-            frappe.throw("Field 'Calibration Status' is required.")
-        if self.calibration_status and self.calibration_status not in ['Valid', 'Due', 'Overdue', 'Not Required']:
-            frappe.throw("Field 'Calibration Status' must be one of ['Valid', 'Due', 'Overdue', 'Not Required'].")
-        if self.usage_hours is not None and not isinstance(self.usage_hours, float):
-            frappe.throw("Field 'Usage Hours' must be a float.")
+_CALIBRATION_STATUS_OPTIONS = frozenset({'Valid', 'Due', 'Overdue', 'Not Required'})
+
+# (fieldname, label, required, allowed values, type)
+_SCHEMA = (
+    ('equipment_id', 'Equipment ID', True, None, None),
+    ('equipment_name', 'Equipment Name', True, None, None),
+    ('calibration_status', 'Calibration Status', True, _CALIBRATION_STATUS_OPTIONS, None),
+    ('usage_hours', 'Usage Hours', False, None, float),
+)
+
+class SpcEquipment(SPCValidatedDocument):
+    _schema = _SCHEMA
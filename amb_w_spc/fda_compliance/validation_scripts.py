@@ -9,91 +9,291 @@ in ERPNext custom apps or through custom scripts.
 
 import frappe
 import hashlib
-import json
+import orjson
+import time
+from collections import namedtuple
 from datetime import datetime
 from frappe import _
+from frappe.model.naming import make_autoname
 
 # =============================================================================
 # AUDIT TRAIL CAPTURE
 # =============================================================================
 
+# Field types whose changes are recorded by get_document_changes
+DIFFABLE_FIELDTYPES = frozenset({'Data', 'Text', 'Select', 'Float', 'Int', 'Date', 'Datetime'})
+
+# Field types whose required fields must hold legible content (ALCOA+)
+LEGIBLE_FIELDTYPES = frozenset({'Text', 'Text Editor', 'Long Text'})
+
+# Fields required once a document reaches a given status, keyed by doctype
+STATUS_REQUIRED_FIELDS = {
+    'SPC Batch Record': ('batch_status', {
+        'Complete': ('production_supervisor', 'quality_inspector', 'test_results'),
+        'Approved': ('batch_reviewer',),
+        'Released': ('batch_approver', 'release_date')
+    }),
+    'SPC Deviation': ('deviation_status', {
+        'Under Investigation': ('investigation_team', 'investigation_start_date'),
+        'Pending CAPA': ('root_cause_analysis', 'corrective_actions'),
+        'Closed': ('closure_approval', 'closure_date', 'closure_justification')
+    })
+}
+
+# (start, end) date fields that must be in order, keyed by doctype
+DATE_SEQUENCES = {
+    'SPC Deviation': (
+        ('occurrence_date', 'detection_date'),
+        ('investigation_start_date', 'investigation_target_date'),
+        ('investigation_start_date', 'investigation_completion_date')
+    )
+}
+
+MetaFieldsets = namedtuple('MetaFieldsets', 'diffable text_required date_pairs required_by_status')
+
+# Site cache hash of MetaFieldsets, keyed by doctype
+META_FIELDSETS_KEY = 'amb_w_spc:meta_fieldsets'
+
+# Audit action recorded for each document hook method
+AUDIT_ACTIONS = {
+    'after_insert': 'Create',
+    'on_update': 'Update',
+    'on_cancel': 'Delete',
+    'on_submit': 'Approve',
+    'before_print': 'Print'
+}
+
+# Doctypes never written to the audit trail
+SKIP_AUDIT_DOCTYPES = frozenset({
+    'SPC Audit Trail', 'Version', 'Activity Log', 'Error Log', 'Scheduled Job Log'
+})
+
+AuditRequestContext = namedtuple('AuditRequestContext', 'user sid ip_address browser_info')
+
+# Top-level keys rewritten by every save that carry no record content;
+# left out of the integrity hash (owner, creation and docstatus stay in)
+UNHASHED_FIELDS = frozenset({'modified', 'modified_by', 'idx'})
+
+# SPC Audit Trail columns written by persist_audit_trail
+AUDIT_TRAIL_FIELDS = (
+    'record_id', 'timestamp', 'user_id', 'action_type', 'table_name', 'record_name',
+    'field_changed', 'old_value', 'new_value', 'ip_address', 'browser_info',
+    'session_id', 'checksum', 'hash_value', 'backup_status'
+)
+
 def capture_audit_trail(doc, method):
     """
     Automatic audit trail capture for all document operations
     This should be called from document hooks (after_insert, on_update, on_cancel, etc.)
     """
-    if doc.doctype == "SPC Audit Trail":
-        return  # Prevent recursive calls
+    # Prevent recursive calls and skip log doctypes that are audit records themselves
+    if doc.doctype in SKIP_AUDIT_DOCTYPES:
+        return
+    
+    # Only hook methods with an audit action produce a row
+    action_type = AUDIT_ACTIONS.get(method)
+    if action_type is None:
+        return
+    
+    # Migrations, installs and patches are not user actions
+    if frappe.flags.in_migrate or frappe.flags.in_install or frappe.flags.in_patch:
+        return
     
     try:
-        # Determine action type based on method
-        action_mapping = {
-            'after_insert': 'Create',
-            'on_update': 'Update', 
-            'on_cancel': 'Delete',
-            'on_submit': 'Approve',
-            'before_print': 'Print'
-        }
+        context = get_audit_request_context()
+        timestamp = frappe.utils.now()
         
-        action_type = action_mapping.get(method, 'Read')
-        
-        # Get session information
-        request = frappe.local.request
-        ip_address = frappe.utils.get_request_ip()
-        browser_info = request.headers.get('User-Agent', '') if request else ''
-        
-        # Create audit trail record
-        audit_trail = frappe.get_doc({
+        # Build audit trail record (hashed and inserted by a background job
+        # once the transaction commits). Session and request details are
+        # captured here since the worker has no request.
+        audit_trail = frappe._dict({
             'doctype': 'SPC Audit Trail',
-            'record_id': f"{doc.doctype}_{doc.name}_{frappe.utils.now()}",
-            'timestamp': frappe.utils.now(),
-            'user_id': frappe.session.user,
+            'record_id': f"{doc.doctype}_{doc.name}_{timestamp}",
+            'timestamp': timestamp,
+            'user_id': context.user,
             'action_type': action_type,
             'table_name': doc.doctype,
             'record_name': doc.name,
-            'ip_address': ip_address,
-            'browser_info': browser_info,
-            'session_id': frappe.session.sid,
-            'checksum': generate_checksum(doc),
-            'hash_value': generate_hash(doc),
+            'ip_address': context.ip_address,
+            'browser_info': context.browser_info,
+            'session_id': context.sid,
             'backup_status': 'Pending'
         })
         
         # Add field changes for updates
-        if method == 'on_update' and hasattr(doc, '_doc_before_save'):
-            changes = get_document_changes(doc._doc_before_save, doc)
+        doc_before_save = doc.__dict__.get('_doc_before_save')
+        if method == 'on_update' and doc_before_save is not None:
+            changes = get_document_changes(doc_before_save, doc)
             if changes:
                 audit_trail.field_changed = changes['field']
                 audit_trail.old_value = changes['old_value']
                 audit_trail.new_value = changes['new_value']
         
-        audit_trail.insert(ignore_permissions=True)
+        queue_audit_trail(audit_trail, _serialize_doc(doc))
         
     except Exception as e:
         frappe.log_error(f"Audit trail capture failed: {str(e)}", "FDA Compliance Error")
 
-def generate_checksum(doc):
-    """Generate MD5 checksum for document data integrity"""
-    doc_data = json.dumps(doc.as_dict(), sort_keys=True, default=str)
-    return hashlib.md5(doc_data.encode()).hexdigest()
+def get_audit_request_context():
+    """
+    Session user/sid, client IP and User-Agent of the current request,
+    resolved once and kept on frappe.local for the remaining hooks (and
+    re-resolved if frappe.set_user switches the session user)
+    """
+    context = getattr(frappe.local, 'spc_audit_context', None)
+    if context is None or context.user != frappe.session.user:
+        request = frappe.local.request
+        context = frappe.local.spc_audit_context = AuditRequestContext(
+            frappe.session.user,
+            frappe.session.sid,
+            frappe.utils.get_request_ip(),
+            request.headers.get('User-Agent', '') if request else ''
+        )
+    return context
+
+def queue_audit_trail(values, payload):
+    """
+    Queue an audit trail row and the serialized document it covers. The
+    queue belongs to the current transaction and is handed to a background
+    job once it commits.
+    """
+    queue = getattr(frappe.local, 'spc_audit_queue', None)
+    if queue is None:
+        queue = frappe.local.spc_audit_queue = []
+        frappe.db.after_commit.add(flush_audit_trail_queue)
+        frappe.db.after_rollback.add(discard_audit_trail_queue)
+    queue.append((values, payload))
+
+def discard_audit_trail_queue():
+    """Drop audit rows of a rolled back transaction"""
+    frappe.local.spc_audit_queue = None
+
+def flush_audit_trail_queue():
+    """Enqueue the committed transaction's audit rows as a single job"""
+    queue = getattr(frappe.local, 'spc_audit_queue', None)
+    frappe.local.spc_audit_queue = None
+    if not queue:
+        return
+    
+    frappe.enqueue(
+        'amb_w_spc.fda_compliance.validation_scripts.persist_audit_trail',
+        queue='short',
+        entries=queue
+    )
+
+def persist_audit_trail(entries):
+    """Hash all queued payloads in one batch and bulk-insert their audit rows"""
+    digests = hash_payloads([payload for _, payload in entries])
+    
+    def rows():
+        now = frappe.utils.now()
+        for (values, _), digest in zip(entries, digests):
+            values.checksum, values.hash_value = integrity_hashes(digest)
+            yield (frappe.generate_hash(length=10), now, now, values.user_id, values.user_id,
+                   *(values.get(field) for field in AUDIT_TRAIL_FIELDS))
+    
+    try:
+        frappe.db.bulk_insert(
+            'SPC Audit Trail',
+            ('name', 'creation', 'modified', 'owner', 'modified_by') + AUDIT_TRAIL_FIELDS,
+            rows(),
+            chunk_size=500
+        )
+    except Exception as e:
+        frappe.log_error(f"Audit trail capture failed: {str(e)}", "FDA Compliance Error")
 
-def generate_hash(doc):
-    """Generate SHA-256 hash for tamper detection"""
-    doc_data = json.dumps(doc.as_dict(), sort_keys=True, default=str)
-    return hashlib.sha256(doc_data.encode()).hexdigest()
+def hash_payloads(payloads):
+    """
+    SHA-256 digests for a batch of payloads.
+
+    Batching is the seam for a multi-buffer (SIMD) SHA-256 implementation;
+    until one is available as a maintained binding this runs hashlib's
+    OpenSSL SHA-256 (SHA-NI where the CPU supports it) per payload.
+    """
+    return [hashlib.sha256(payload).digest() for payload in payloads]
+
+def _serialize_doc(doc):
+    """
+    Serialize the document once per saved version (keyed on ``modified``)
+    and cache the bytes on the document so every audit hook reuses them.
+    Save bookkeeping (UNHASHED_FIELDS and ``_``-prefixed keys such as
+    ``_user_tags``) is left out of the hashed payload.
+    """
+    cached = doc.__dict__.get('_audit_payload')
+    if cached and cached[0] == doc.modified:
+        return cached[1]
+    
+    values = {key: value for key, value in doc.as_dict().items()
+              if key not in UNHASHED_FIELDS and key[0] != '_'}
+    payload = orjson.dumps(values, option=orjson.OPT_SORT_KEYS, default=str)
+    doc.__dict__['_audit_payload'] = (doc.modified, payload)
+    return payload
+
+def integrity_hashes(digest):
+    """
+    Return ``(checksum, hash_value)`` for data integrity and tamper detection.
+
+    Both come from a single SHA-256 over the serialized document: the hash is
+    the full hex digest and the checksum its first 16 bytes.
+    """
+    return digest[:16].hex(), digest.hex()
+
+def sha256_hex(*parts):
+    """
+    SHA-256 of the parts joined with '_', assembled into one buffer and
+    hashed in a single update so OpenSSL can stream whole blocks
+    """
+    return hashlib.sha256("_".join(map(str, parts)).encode()).hexdigest()
+
+def get_meta_fieldsets(doctype):
+    """
+    Fieldname classifications used by the compliance hooks, built in one pass
+    over the doctype meta and kept in the site's Redis cache, so every worker
+    of the site sees the same fieldsets and a clear reaches all of them:
+
+    - diffable: fields (in form order) whose changes go to the audit trail
+    - text_required: mandatory free-text fields checked for legibility
+    - date_pairs: (start, end) fields that must be in order
+    - required_by_status: (status field, {status: required fields}) or None
+    """
+    return frappe.cache().hget(META_FIELDSETS_KEY, doctype,
+        generator=lambda: build_meta_fieldsets(doctype))
+
+def build_meta_fieldsets(doctype):
+    """Build the MetaFieldsets of a doctype from its current meta"""
+    diffable, text_required = [], []
+    for field in frappe.get_meta(doctype).fields:
+        if field.fieldtype in DIFFABLE_FIELDTYPES:
+            diffable.append(field.fieldname)
+        if field.fieldtype in LEGIBLE_FIELDTYPES and field.reqd:
+            text_required.append(field.fieldname)
+    
+    return MetaFieldsets(
+        tuple(diffable),
+        tuple(text_required),
+        DATE_SEQUENCES.get(doctype, ()),
+        STATUS_REQUIRED_FIELDS.get(doctype)
+    )
+
+def clear_meta_fieldsets_cache(doc=None, method=None):
+    """Drop cached fieldsets (clear_cache hook and DocType, Custom Field and
+    Property Setter changes)"""
+    frappe.cache().delete_value(META_FIELDSETS_KEY)
 
 def get_document_changes(old_doc, new_doc):
     """Compare documents and return first significant change"""
-    for field in new_doc.meta.fields:
-        if field.fieldtype in ['Data', 'Text', 'Select', 'Float', 'Int', 'Date', 'Datetime']:
-            old_value = old_doc.get(field.fieldname)
-            new_value = new_doc.get(field.fieldname)
-            if old_value != new_value:
-                return {
-                    'field': field.fieldname,
-                    'old_value': str(old_value or ''),
-                    'new_value': str(new_value or '')
-                }
+    # Field values live in the documents' __dict__; read them directly
+    old_values = old_doc.__dict__
+    new_values = new_doc.__dict__
+    for fieldname in get_meta_fieldsets(new_doc.doctype).diffable:
+        old_value = old_values.get(fieldname)
+        new_value = new_values.get(fieldname)
+        if old_value != new_value:
+            return {
+                'field': fieldname,
+                'old_value': str(old_value or ''),
+                'new_value': str(new_value or '')
+            }
     return None
 
 # =============================================================================
@@ -119,20 +319,20 @@ def validate_electronic_signature(doc, method):
     
     # Generate signature hash
     if not doc.signature_hash:
-        signature_data = f"{doc.signer_name}_{doc.signature_date}_{doc.signature_meaning}_{doc.document_type}_{doc.document_name}"
-        doc.signature_hash = hashlib.sha256(signature_data.encode()).hexdigest()
+        doc.signature_hash = sha256_hex(doc.signer_name, doc.signature_date, doc.signature_meaning,
+                                        doc.document_type, doc.document_name)
     
     # Set CFR Part 11 compliance flag
     doc.cfr_part11_compliant = 1
     
     # Create signature components JSON
     components = {
-        'printed_name': frappe.get_value('User', doc.signer_name, 'full_name'),
+        'printed_name': frappe.get_cached_value('User', doc.signer_name, 'full_name'),
         'date_time': doc.signature_date,
         'meaning': doc.signature_meaning,
         'method': doc.signature_method
     }
-    doc.signature_components = json.dumps(components)
+    doc.signature_components = orjson.dumps(components, default=str).decode()
 
 # =============================================================================
 # BATCH RECORD VALIDATION
@@ -160,12 +360,7 @@ def validate_batch_record(doc, method):
     
     # Validate specifications met
     if doc.parameters_tested:
-        all_passed = True
-        for param in doc.parameters_tested:
-            if param.pass_fail != 'Pass':
-                all_passed = False
-                break
-        doc.specifications_met = 1 if all_passed else 0
+        doc.specifications_met = int(all(param.pass_fail == 'Pass' for param in doc.parameters_tested))
     
     # Set data integrity verification
     if doc.batch_status == 'Released':
@@ -206,31 +401,30 @@ def validate_deviation(doc, method):
             doc.regulatory_timeline = frappe.utils.add_days(doc.detection_date, 15)
 
 def generate_deviation_number(plant, deviation_type):
-    """Generate unique deviation number"""
-    plant_code = frappe.get_value('Warehouse', plant, 'warehouse_name')[:3].upper()
+    """
+    Generate unique deviation number, e.g. DEV-PLA-MAN-2025-0001.
+
+    The sequence comes from a naming series (tabSeries), which is one atomic
+    indexed update and safe under concurrent inserts.
+    """
+    plant_code = frappe.get_cached_value('Warehouse', plant, 'warehouse_name')[:3].upper()
     type_code = deviation_type[:3].upper()
     year = datetime.now().year
     
-    # Get next sequence number
-    existing = frappe.get_all('SPC Deviation', 
-                            filters={'name': ['like', f'DEV-{plant_code}-{type_code}-{year}-%']},
-                            order_by='creation desc',
-                            limit=1)
-    
-    if existing:
-        last_num = existing[0].name.split('-')[-1]
-        next_num = int(last_num) + 1
-    else:
-        next_num = 1
-    
-    return f"DEV-{plant_code}-{type_code}-{year}-{next_num:04d}"
+    return make_autoname(f"DEV-{plant_code}-{type_code}-{year}-.####")
 
 # =============================================================================
 # DATA INTEGRITY VALIDATION
 # =============================================================================
 
 def validate_data_integrity(doc, method):
-    """Validate data integrity across all FDA documents"""
+    """
+    Validate data integrity across all FDA documents.
+
+    These checks only read values already loaded on the document (no Link
+    lookups), so they add no queries per row; Link existence is left to
+    Frappe's own batched link validation in Document._validate_links.
+    """
     # Check for required fields based on document status
     required_fields = get_required_fields_by_status(doc)
     
@@ -246,42 +440,18 @@ def validate_data_integrity(doc, method):
 
 def get_required_fields_by_status(doc):
     """Return required fields based on document status"""
-    required_map = {
-        'SPC Batch Record': {
-            'Complete': ['production_supervisor', 'quality_inspector', 'test_results'],
-            'Approved': ['batch_reviewer'],
-            'Released': ['batch_approver', 'release_date']
-        },
-        'SPC Deviation': {
-            'Under Investigation': ['investigation_team', 'investigation_start_date'],
-            'Pending CAPA': ['root_cause_analysis', 'corrective_actions'],
-            'Closed': ['closure_approval', 'closure_date', 'closure_justification']
-        }
-    }
-    
-    status_field_map = {
-        'SPC Batch Record': 'batch_status',
-        'SPC Deviation': 'deviation_status'
-    }
-    
-    status_field = status_field_map.get(doc.doctype)
-    if status_field and doc.get(status_field):
-        return required_map.get(doc.doctype, {}).get(doc.get(status_field), [])
-    
-    return []
+    required_by_status = get_meta_fieldsets(doc.doctype).required_by_status
+    if required_by_status:
+        status_field, required_map = required_by_status
+        status = doc.get(status_field)
+        if status:
+            return required_map.get(status, ())
+    
+    return ()
 
 def validate_date_sequences(doc):
     """Validate logical date sequences"""
-    date_sequences = {
-        'SPC Deviation': [
-            ('occurrence_date', 'detection_date'),
-            ('investigation_start_date', 'investigation_target_date'),
-            ('investigation_start_date', 'investigation_completion_date')
-        ]
-    }
-    
-    sequences = date_sequences.get(doc.doctype, [])
-    for start_field, end_field in sequences:
+    for start_field, end_field in get_meta_fieldsets(doc.doctype).date_pairs:
         start_date = doc.get(start_field)
         end_date = doc.get(end_field)
         
@@ -294,43 +464,56 @@ def validate_alcoa_compliance(doc):
     if not doc.owner:
         frappe.throw(_("Document must have clear attribution (owner)"))
     
-    # Legible - check for required text fields
-    text_fields = [field.fieldname for field in doc.meta.fields 
-                  if field.fieldtype in ['Text', 'Text Editor', 'Long Text'] and field.reqd]
-    
-    for field in text_fields:
+    # Legible - check for required text fields, reporting all of them at once.
+    # A value that strips to fewer than 10 characters also covers the
+    # whitespace-only case, so one strip() per field is enough.
+    illegible = []
+    for field in get_meta_fieldsets(doc.doctype).text_required:
         value = doc.get(field)
-        if value and (len(value.strip()) < 10 or not value.replace(' ', '').replace('\n', '')):
-            frappe.throw(_(f"Field {field} must contain meaningful, legible content"))
+        if value and len(value.strip()) < 10:
+            illegible.append(_(f"Field {field} must contain meaningful, legible content"))
+    if illegible:
+        frappe.throw(illegible, as_list=True)
     
     # Contemporaneous - validate timestamps
-    if hasattr(doc, 'timestamp') and doc.timestamp:
-        time_diff = abs((datetime.now() - doc.timestamp).total_seconds())
-        if time_diff > 300:  # 5 minutes tolerance
+    timestamp = doc.get('timestamp')
+    if timestamp:
+        # Compare epoch seconds; naive datetimes are local time, as datetime.now() was
+        if isinstance(timestamp, str):
+            timestamp = frappe.utils.get_datetime(timestamp)
+        if abs(time.time() - timestamp.timestamp()) > 300:  # 5 minutes tolerance
             frappe.log_error(f"Non-contemporaneous timestamp detected: {doc.doctype} {doc.name}")
 
 # =============================================================================
 # HOOK REGISTRATION
 # =============================================================================
 
-# These hooks should be registered in hooks.py of your custom app:
+# These hooks should be registered in hooks.py of your custom app. They are
+# scoped to the FDA record doctypes rather than "*", so saves of unrelated
+# doctypes (User, File, Email Queue, ...) do not run them. Child tables are
+# covered through their parent's hooks and serialized payload.
+
+_MODULE = "amb_w_spc.fda_compliance.validation_scripts"
+
+_AUDIT_EVENTS = {
+    "after_insert": f"{_MODULE}.capture_audit_trail",
+    "on_update": f"{_MODULE}.capture_audit_trail",
+    "on_cancel": f"{_MODULE}.capture_audit_trail",
+    "on_submit": f"{_MODULE}.capture_audit_trail"
+}
 
 doc_events = {
-    "*": {
-        "after_insert": "path.to.this.module.capture_audit_trail",
-        "on_update": "path.to.this.module.capture_audit_trail", 
-        "on_cancel": "path.to.this.module.capture_audit_trail",
-        "on_submit": "path.to.this.module.capture_audit_trail",
-        "validate": "path.to.this.module.validate_data_integrity"
-    },
     "SPC Electronic Signature": {
-        "validate": "path.to.this.module.validate_electronic_signature"
+        **_AUDIT_EVENTS,
+        "validate": [f"{_MODULE}.validate_data_integrity", f"{_MODULE}.validate_electronic_signature"]
     },
     "SPC Batch Record": {
-        "validate": "path.to.this.module.validate_batch_record"
+        **_AUDIT_EVENTS,
+        "validate": [f"{_MODULE}.validate_data_integrity", f"{_MODULE}.validate_batch_record"]
     },
     "SPC Deviation": {
-        "validate": "path.to.this.module.validate_deviation"
+        **_AUDIT_EVENTS,
+        "validate": [f"{_MODULE}.validate_data_integrity", f"{_MODULE}.validate_deviation"]
     }
 }
 
@@ -339,48 +522,50 @@ doc_events = {
 # =============================================================================
 
 def get_fda_compliance_dashboard():
-    """Generate FDA compliance dashboard data"""
-    return {
-        'audit_trail_count': frappe.db.count('SPC Audit Trail'),
-        'signatures_today': frappe.db.count('SPC Electronic Signature', {
-            'signature_date': ['>=', frappe.utils.today()]
-        }),
-        'open_deviations': frappe.db.count('SPC Deviation', {
-            'deviation_status': ['in', ['Open', 'Under Investigation']]
-        }),
-        'overdue_capadont': frappe.db.count('Deviation CAPA Action', {
-            'status': ['!=', 'Closed'],
-            'target_completion_date': ['<', frappe.utils.today()]
-        }),
-        'batches_pending_release': frappe.db.count('SPC Batch Record', {
-            'batch_status': ['in', ['Complete', 'Approved']]
-        })
-    }
+    """Generate FDA compliance dashboard data (all counts in one round-trip)"""
+    today = frappe.utils.today()
+    return dict(frappe.db.sql("""
+        SELECT 'audit_trail_count', COUNT(*) FROM `tabSPC Audit Trail`
+        UNION ALL
+        SELECT 'signatures_today', COUNT(*) FROM `tabSPC Electronic Signature`
+            WHERE signature_date >= %(today)s
+        UNION ALL
+        SELECT 'open_deviations', COUNT(*) FROM `tabSPC Deviation`
+            WHERE deviation_status IN ('Open', 'Under Investigation')
+        UNION ALL
+        SELECT 'overdue_capa', COUNT(*) FROM `tabDeviation CAPA Action`
+            WHERE IFNULL(status, '') != 'Closed' AND target_completion_date < %(today)s
+        UNION ALL
+        SELECT 'batches_pending_release', COUNT(*) FROM `tabSPC Batch Record`
+            WHERE batch_status IN ('Complete', 'Approved')
+    """, {'today': today}))
 
 def run_compliance_check():
     """Run comprehensive compliance check"""
     issues = []
     
     # Check for unsigned critical documents
-    critical_docs = frappe.get_all('SPC Batch Record', 
-                                 filters={'batch_status': 'Released', 'batch_approver': ['is', 'not set']})
-    if critical_docs:
-        issues.append(f"Found {len(critical_docs)} released batches without approver signature")
+    unsigned_batches = frappe.db.count('SPC Batch Record',
+                                       {'batch_status': 'Released', 'batch_approver': ['is', 'not set']})
+    if unsigned_batches:
+        issues.append(f"Found {unsigned_batches} released batches without approver signature")
     
     # Check for overdue investigations
-    overdue_investigations = frappe.get_all('SPC Deviation',
-                                          filters={
-                                              'investigation_target_date': ['<', frappe.utils.today()],
-                                              'deviation_status': ['!=', 'Closed']
-                                          })
+    overdue_investigations = frappe.db.count('SPC Deviation', {
+        'investigation_target_date': ['<', frappe.utils.today()],
+        'deviation_status': ['!=', 'Closed']
+    })
     if overdue_investigations:
-        issues.append(f"Found {len(overdue_investigations)} overdue investigations")
+        issues.append(f"Found {overdue_investigations} overdue investigations")
     
-    # Check for missing audit trails
-    recent_changes = frappe.get_all('Version', filters={'creation': ['>=', frappe.utils.add_days(None, -1)]})
-    audit_records = frappe.get_all('SPC Audit Trail', filters={'timestamp': ['>=', frappe.utils.add_days(None, -1)]})
+    # Check for missing audit trails (both counts in one round-trip)
+    cutoff = frappe.utils.add_days(None, -1)
+    difference = frappe.db.sql("""
+        SELECT (SELECT COUNT(*) FROM `tabVersion` WHERE creation >= %(cutoff)s)
+            - (SELECT COUNT(*) FROM `tabSPC Audit Trail` WHERE timestamp >= %(cutoff)s)
+    """, {'cutoff': cutoff})[0][0]
     
-    if len(recent_changes) != len(audit_records):
+    if difference:
         issues.append("Audit trail records do not match document changes")
     
     return issues
@@ -406,10 +591,10 @@ def weekly_audit_trail_summary():
     summary = frappe.db.sql("""
         SELECT action_type, COUNT(*) as count, user_id
         FROM `tabSPC Audit Trail`
-        WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
+        WHERE timestamp >= %s
         GROUP BY action_type, user_id
         ORDER BY count DESC
-    """, as_dict=True)
+    """, (frappe.utils.add_days(frappe.utils.now_datetime(), -7),), as_dict=True)
     
     # Generate and email summary report
     html_content = frappe.render_template('templates/audit_trail_summary.html', {'data': summary})
@@ -6,6 +6,11 @@ app_email = "fcrm@amb-wellness.com"
 app_license = "MIT"
 app_version = "2.0.0"
 
+# Note: Frappe reads this module only when building the merged hooks, which
+# are then served from the "app_hooks" cache. Keep multi-valued hooks as
+# lists: frappe.get_hooks wraps any non-list value (tuples included) in a
+# list, so a tuple here would be registered as a single entry.
+
 # Required property for ERPNext
 required_apps = ["frappe", "erpnext"]
 
@@ -73,6 +78,17 @@ doc_events = {
     },
     "Material Assessment Log": {
         "on_submit": "amb_w_spc.sfc_manufacturing.warehouse_management.warehouse_batch_integration.WarehouseBatchIntegration.create_stock_entry_batch_history"
+    },
+    "DocType": {
+        "on_update": "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache"
+    },
+    "Custom Field": {
+        "on_update": "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache",
+        "on_trash": "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache"
+    },
+    "Property Setter": {
+        "on_update": "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache",
+        "on_trash": "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache"
     }
 }
 
@@ -247,6 +263,11 @@ after_migrate = [
     "amb_w_spc.system_integration.installation.create_default_warehouse_zones"
 ]
 
+# Cache invalidation (bench clear-cache / migrate)
+clear_cache = [
+    "amb_w_spc.fda_compliance.validation_scripts.clear_meta_fieldsets_cache"
+]
+
 # App initialization functions
 def on_doctype_update():
     """Setup workflow integration for warehouse management"""
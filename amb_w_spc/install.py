@@ -11,6 +11,9 @@ def after_install(app_name=None):
     setup_navigation()
     create_workspaces()
     
+    # Single commit for all of the setup above
+    frappe.db.commit()
+    
 def create_workspaces():
     """Create workspaces programmatically"""
     print("Creating workspaces...")
@@ -43,16 +46,12 @@ def create_workspaces():
             workspace.insert()
             print(f"✅ Created {ws_config['name']} workspace")
     
-    frappe.db.commit()
-    
 def setup_navigation():
     """Setup workspaces and desktop icons"""
     print("Setting up navigation...")
     
     # Workspaces will be loaded from fixtures
     # Desktop icons will be auto-created from modules
-    
-    frappe.db.commit()
     print("✅ Navigation setup completed")
 
 def create_modules_v15():
@@ -63,15 +62,19 @@ def create_modules_v15():
         "real_time_monitoring", "sensor_management", "system_integration", "fda_compliance"
     ]
     
-    for module in modules:
-        if not frappe.db.exists("Module Def", module):
-            print(f"Creating module: {module}")
-            frappe.db.sql("""
-                INSERT INTO `tabModule Def` 
-                (`name`, `creation`, `modified`, `modified_by`, `owner`, 
-                 `docstatus`, `idx`, `module_name`, `custom`, `app_name`)
-                VALUES (%s, NOW(), NOW(), %s, %s, %s, %s, %s, %s, %s)
-            """, (module, "Administrator", "Administrator", 0, 0, module, 0, "amb_w_spc"))
+    # One query for the existing modules and one multi-row INSERT for the rest
+    existing = set(frappe.get_all("Module Def", filters={"name": ["in", modules]}, pluck="name"))
+    missing = [module for module in modules if module not in existing]
+    
+    if missing:
+        print(f"Creating modules: {', '.join(missing)}")
+        now = frappe.utils.now()
+        frappe.db.bulk_insert(
+            "Module Def",
+            ["name", "creation", "modified", "modified_by", "owner",
+             "docstatus", "idx", "module_name", "custom", "app_name"],
+            [(module, now, now, "Administrator", "Administrator", 0, 0, module, 0, "amb_w_spc")
+             for module in missing]
+        )
     
-    frappe.db.commit()
     print("✅ All modules created successfully!")
@@ -0,0 +1,9 @@
+from amb_w_spc.sfc_manufacturing.doctype.batch_amb.batch_amb import on_doctype_update
+
+def execute():
+    """
+    Create the Batch AMB report index on existing sites, where the DocType
+    is not re-imported (and on_doctype_update not run) unless its JSON
+    changes
+    """
+    on_doctype_update()
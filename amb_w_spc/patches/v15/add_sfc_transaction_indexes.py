@@ -0,0 +1,10 @@
+from amb_w_spc.sfc_manufacturing.doctype.sfc_transaction.sfc_transaction import on_doctype_update
+
+def execute():
+    """
+    Create the SFC Transaction lookup indexes on existing sites.
+    on_doctype_update only runs when the DocType itself is synced, which
+    migrate skips while the JSON is unchanged; add_index is a no-op for
+    indexes that already exist.
+    """
+    on_doctype_update()
@@ -0,0 +1,21 @@
+import frappe
+
+SPC_DATA_POINT_INDEXES = (
+    # Filters of get_spc_analysis with the timestamp range last
+    ["work_order", "operation", "parameter", "timestamp"],
+    # Covers the per-parameter aggregation without reading the table rows
+    ["parameter", "timestamp", "measurement_value"],
+)
+
+def execute():
+    """
+    Add composite indexes for the SFC quality integration queries on
+    SPC Data Point. The integration columns (work_order, operation,
+    measurement_value) are custom fields on some sites only, so each index
+    is skipped when one of its columns is missing.
+    """
+    for columns in SPC_DATA_POINT_INDEXES:
+        if all(frappe.db.has_column("SPC Data Point", column) for column in columns):
+            frappe.db.add_index("SPC Data Point", columns)
+        else:
+            print(f"Skipping SPC Data Point index on {columns}: column missing")
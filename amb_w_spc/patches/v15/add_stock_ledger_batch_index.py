@@ -0,0 +1,17 @@
+import frappe
+
+def execute():
+    """
+    Index Stock Ledger Entry on (batch_no, item_code, posting_date, creation)
+    so the latest ledger entries of a batch (get_batch_stock_info and
+    get_batch_stock_info_bulk) are read in index order instead of being
+    filesorted
+    """
+    if not frappe.db.table_exists("Stock Ledger Entry"):
+        return
+    
+    frappe.db.add_index(
+        "Stock Ledger Entry",
+        ["batch_no", "item_code", "posting_date", "creation"],
+        "idx_sle_batch_item_date"
+    )
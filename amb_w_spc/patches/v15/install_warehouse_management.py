@@ -1,5 +1,6 @@
 import frappe
 from frappe import _
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe.utils import getdate, now_datetime
 import json
 
@@ -7,17 +8,20 @@ def execute():
     """Install warehouse management functionality for AMB W SPC"""
     
     try:
+        # Look up what is already installed once for all the steps below
+        ctx = get_install_context()
+        
         # Install custom fields
-        install_custom_fields()
+        install_custom_fields(ctx)
         
         # Install Material Assessment Log DocType
-        install_material_assessment_log()
+        install_material_assessment_log(ctx)
         
         # Create warehouse hierarchy if needed
         create_default_warehouses()
         
         # Setup permissions
-        setup_permissions()
+        setup_permissions(ctx)
         
         frappe.msgprint(_("Warehouse management functionality installed successfully"))
         
@@ -25,7 +29,21 @@ def execute():
         frappe.log_error(f"Warehouse management installation failed: {str(e)}")
         print(f"Error: {str(e)}")
 
-def install_custom_fields():
+def get_install_context():
+    """Existing DocTypes and (dt, fieldname) custom fields relevant to this patch"""
+    return frappe._dict({
+        "doctypes": set(frappe.get_all(
+            "DocType", filters={"name": ["in", ["Material Assessment Log"]]}, pluck="name"
+        )),
+        "custom_fields": set(frappe.get_all(
+            "Custom Field",
+            filters={"dt": ["in", ["Stock Entry", "Warehouse", "Work Order"]]},
+            fields=["dt", "fieldname"],
+            as_list=True
+        ))
+    })
+
+def install_custom_fields(ctx):
     """Install custom fields for Stock Entry, Warehouse, and Work Order"""
     
     # Stock Entry Custom Fields
@@ -76,16 +94,6 @@ def install_custom_fields():
         }
     ]
     
-    # Install Stock Entry fields
-    for field_config in stock_entry_fields:
-        if not frappe.db.exists("Custom Field", {"dt": field_config["dt"], "fieldname": field_config["fieldname"]}):
-            try:
-                custom_field = frappe.get_doc(field_config)
-                custom_field.insert(ignore_permissions=True)
-                print(f"Created custom field: {field_config['fieldname']}")
-            except Exception as e:
-                print(f"Failed to create custom field {field_config['fieldname']}: {str(e)}")
-    
     # Warehouse Custom Fields
     warehouse_fields = [
         {
@@ -109,16 +117,6 @@ def install_custom_fields():
         }
     ]
     
-    # Install Warehouse fields
-    for field_config in warehouse_fields:
-        if not frappe.db.exists("Custom Field", {"dt": field_config["dt"], "fieldname": field_config["fieldname"]}):
-            try:
-                custom_field = frappe.get_doc(field_config)
-                custom_field.insert(ignore_permissions=True)
-                print(f"Created custom field: {field_config['fieldname']}")
-            except Exception as e:
-                print(f"Failed to create custom field {field_config['fieldname']}: {str(e)}")
-    
     # Work Order Custom Fields
     work_order_fields = [
         {
@@ -145,20 +143,28 @@ def install_custom_fields():
         }
     ]
     
-    # Install Work Order fields
-    for field_config in work_order_fields:
-        if not frappe.db.exists("Custom Field", {"dt": field_config["dt"], "fieldname": field_config["fieldname"]}):
-            try:
-                custom_field = frappe.get_doc(field_config)
-                custom_field.insert(ignore_permissions=True)
-                print(f"Created custom field: {field_config['fieldname']}")
-            except Exception as e:
-                print(f"Failed to create custom field {field_config['fieldname']}: {str(e)}")
+    # Install all fields that are not there yet. create_custom_fields defers
+    # the cache clear and table update to once per DocType instead of once
+    # per field.
+    missing = {}
+    for field_config in stock_entry_fields + warehouse_fields + work_order_fields:
+        if (field_config["dt"], field_config["fieldname"]) not in ctx.custom_fields:
+            df = {key: value for key, value in field_config.items() if key not in ("doctype", "dt")}
+            missing.setdefault(field_config["dt"], []).append(df)
+    
+    if missing:
+        try:
+            create_custom_fields(missing, update=False)
+            for dt, fields in missing.items():
+                for df in fields:
+                    print(f"Created custom field: {df['fieldname']}")
+        except Exception as e:
+            print(f"Failed to create custom fields: {str(e)}")
 
-def install_material_assessment_log():
+def install_material_assessment_log(ctx):
     """Install Material Assessment Log DocType if it doesn't exist"""
     
-    if not frappe.db.exists("DocType", "Material Assessment Log"):
+    if "Material Assessment Log" not in ctx.doctypes:
         try:
             # The DocType should be created by the standard installation process
             print("Material Assessment Log DocType will be created by standard installation")
@@ -185,12 +191,12 @@ def create_default_warehouses():
     except Exception as e:
         print(f"Warehouse hierarchy creation info: {str(e)}")
 
-def setup_permissions():
+def setup_permissions(ctx):
     """Setup permissions for warehouse management"""
     
     try:
         # Material Assessment Log permissions
-        if frappe.db.exists("DocType", "Material Assessment Log"):
+        if "Material Assessment Log" in ctx.doctypes:
             # Manufacturing Manager - full access
             if not frappe.db.exists("Custom DocPerm", {
                 "parent": "Material Assessment Log",
@@ -0,0 +1,30 @@
+import re
+
+import frappe
+
+DEVIATION_NUMBER = re.compile(r"^(DEV-.+-\d{4}-)(\d+)$")
+
+def execute():
+    """
+    Start each DEV-<plant>-<type>-<year>- naming series after the highest
+    deviation number already issued for it, so generate_deviation_number
+    does not hand out numbers that exist (deviation_number is unique)
+    """
+    if not frappe.db.table_exists("SPC Deviation"):
+        return
+    
+    current = {}
+    for (deviation_number,) in frappe.db.sql("""
+        SELECT deviation_number FROM `tabSPC Deviation`
+        WHERE deviation_number LIKE %s
+    """, ("DEV-%",)):
+        match = DEVIATION_NUMBER.match(deviation_number)
+        if match:
+            prefix, number = match.group(1), int(match.group(2))
+            current[prefix] = max(current.get(prefix, 0), number)
+    
+    for prefix, number in current.items():
+        frappe.db.sql("""
+            INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE `current` = GREATEST(`current`, VALUES(`current`))
+        """, (prefix, number))
@@ -3,12 +3,20 @@
 
 import frappe
 from frappe import _
-from frappe.utils import flt, getdate
+from frappe.utils import cint, flt, getdate
 import json
+from bisect import bisect_right
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 @frappe.whitelist()
 def record_quality_measurement(work_order, operation_sequence, measurements, inspector=None):
     """Record quality measurements for an operation"""
+    # The data points and the inspection are written in the request's
+    # transaction; on failure roll back to here so none of them is kept
+    savepoint = "quality_measurement"
+    frappe.db.savepoint(savepoint)
+    
     try:
         # Validate inputs
         if not all([work_order, operation_sequence, measurements]):
@@ -40,28 +48,15 @@ def record_quality_measurement(work_order, operation_sequence, measurements, ins
             'measurements': json.dumps(measurements)
         })
         
-        # Process measurements for SPC analysis
-        for param, value in measurements.items():
-            if isinstance(value, (int, float)):
-                # Create SPC data point
-                spc_doc = frappe.get_doc({
-                    'doctype': 'SPC Data Point',
-                    'work_order': work_order,
-                    'operation': operation_sequence,
-                    'parameter': param,
-                    'measurement_value': flt(value),
-                    'timestamp': frappe.utils.now_datetime(),
-                    'source': 'SFC Operation',
-                    'reference_doc': transaction
-                })
-                spc_doc.insert(ignore_permissions=True)
+        # Process measurements for SPC analysis: one SPC data point per
+        # numeric parameter, written with a single multi-row insert
+        numeric = [(param, value) for param, value in measurements.items()
+                   if isinstance(value, (int, float))]
+        if numeric:
+            insert_data_points(numeric, work_order, operation_sequence, transaction)
         
         quality_doc.insert(ignore_permissions=True)
         
-        # Update SFC transaction with quality data
-        frappe.db.set_value('SFC Transaction', transaction, 
-                           'quality_data', json.dumps(measurements))
-        
         return {
             'status': 'success',
             'quality_inspection': quality_doc.name,
@@ -69,103 +64,240 @@ def record_quality_measurement(work_order, operation_sequence, measurements, ins
         }
         
     except Exception as e:
+        frappe.db.rollback(save_point=savepoint)
         frappe.log_error(f"Error recording quality measurement: {str(e)}")
         return {
             'status': 'error',
             'message': str(e)
         }
 
+# SFC integration columns of SPC Data Point; custom fields on some sites only
+DATA_POINT_INTEGRATION_FIELDS = ('work_order', 'operation', 'measurement_value', 'source', 'reference_doc')
+
+def insert_data_points(measurements, work_order, operation_sequence, transaction):
+    """
+    Insert one SPC Data Point per (parameter, value) with a single
+    bulk_insert. The controller does not run for these rows, so the status
+    is evaluated here against the parameter's active control and
+    specification limits, and alerts are queued for invalid points. The
+    control chart statistics (x_bar, moving_range) are left unset.
+    """
+    from amb_w_spc.core_spc.spc_server_validations import (
+        auto_validate_data_point_status, invalidate_recent_points_cache)
+    
+    now = frappe.utils.now_datetime()
+    user = frappe.session.user
+    limits = get_parameter_limits({param for param, _ in measurements})
+    names = get_data_point_names([param for param, _ in measurements])
+    
+    integration_fields = [field for field in DATA_POINT_INTEGRATION_FIELDS
+                          if frappe.db.has_column('SPC Data Point', field)]
+    integration_values = {
+        'work_order': work_order,
+        'operation': operation_sequence,
+        'source': 'SFC Operation',
+        'reference_doc': transaction
+    }
+    
+    rows, invalid = [], []
+    for name, (param, value) in zip(names, measurements):
+        value = flt(value)
+        ucl, lcl, usl, lsl = limits.get(param, (0.0, 0.0, 0.0, 0.0))
+        point = frappe._dict(status=None, validation_notes=None)
+        auto_validate_data_point_status(point, value, ucl, lcl, usl, lsl)
+        if point.status == 'Invalid':
+            invalid.append(name)
+        
+        integration_values['measurement_value'] = value
+        rows.append((name, now, now, user, user, param, value, now, point.status,
+                     point.validation_notes, ucl or None, lcl or None, usl or None, lsl or None,
+                     *(integration_values[field] for field in integration_fields)))
+    
+    frappe.db.bulk_insert(
+        'SPC Data Point',
+        ['name', 'creation', 'modified', 'owner', 'modified_by', 'parameter', 'measured_value',
+         'timestamp', 'status', 'validation_notes', 'upper_control_limit', 'lower_control_limit',
+         'upper_spec_limit', 'lower_spec_limit', *integration_fields],
+        rows
+    )
+    
+    # The recent values window of each parameter now misses these points
+    for param in {param for param, _ in measurements}:
+        invalidate_recent_points_cache(param)
+    
+    for name in invalid:
+        frappe.enqueue(
+            "amb_w_spc.core_spc.spc_server_validations.check_spc_alerts_bg",
+            queue="short",
+            enqueue_after_commit=True,
+            doc_name=name
+        )
+
+def get_parameter_limits(parameters):
+    """
+    Map each SPC Parameter Master to its active (UCL, LCL, USL, LSL), taken
+    from the latest effective control limit and specification rows; unset
+    limits are 0, which auto_validate_data_point_status ignores
+    """
+    control = {}
+    for row in frappe.get_all('SPC Parameter Control Limit',
+            filters={'parent': ('in', list(parameters)), 'parenttype': 'SPC Parameter Master', 'is_active': 1},
+            fields=['parent', 'ucl', 'lcl'],
+            order_by='effective_from asc'):
+        control[row.parent] = (flt(row.ucl), flt(row.lcl))
+    
+    spec = {}
+    for row in frappe.get_all('SPC Parameter Specification',
+            filters={'parent': ('in', list(parameters)), 'parenttype': 'SPC Parameter Master', 'is_active': 1},
+            fields=['parent', 'upper_spec_limit', 'lower_spec_limit'],
+            order_by='effective_from asc'):
+        spec[row.parent] = (flt(row.upper_spec_limit), flt(row.lower_spec_limit))
+    
+    return {param: control.get(param, (0.0, 0.0)) + spec.get(param, (0.0, 0.0)) for param in parameters}
+
+def get_data_point_names(parameters):
+    """
+    Names for new SPC Data Points in the doctype's format:SPC-{parameter}-{#####}
+    autoname. Frappe numbers format autonames from the shared series with an
+    empty key; the whole block is reserved with one locked update instead of
+    one series round-trip per row.
+    """
+    count = len(parameters)
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name`='' FOR UPDATE")
+    if current and current[0][0] is not None:
+        start = cint(current[0][0])
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name`=''", (count,))
+    else:
+        start = 0
+        frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES ('', %s)", (count,))
+    
+    return [f"SPC-{param}-{start + i:05d}" for i, param in enumerate(parameters, 1)]
+
+# Filters shared by the get_spc_analysis queries ({0} is a table alias
+# prefix). Unset filters are passed as NULL, so the statement text is the
+# same for every combination of filters.
+SPC_ANALYSIS_CONDITIONS = """
+    (%(work_order)s IS NULL OR {0}work_order = %(work_order)s)
+    AND (%(operation)s IS NULL OR {0}operation = %(operation)s)
+    AND (%(parameter)s IS NULL OR {0}parameter = %(parameter)s)
+    AND {0}timestamp >= %(cutoff)s
+"""
+
 @frappe.whitelist()
-def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
-    """Get SPC analysis for quality parameters"""
+def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30, include_points=0):
+    """
+    Get SPC analysis for quality parameters. Summary statistics and
+    out-of-control points are computed in the database; the full series per
+    parameter, and the run rule violations found in it, are only returned
+    when include_points is set.
+    """
     try:
-        conditions = []
-        values = []
-        
-        if work_order:
-            conditions.append("work_order = %s")
-            values.append(work_order)
-        
-        if operation:
-            conditions.append("operation = %s")
-            values.append(operation)
-        
-        if parameter:
-            conditions.append("parameter = %s")
-            values.append(parameter)
-        
-        # Add date filter
-        conditions.append("timestamp >= DATE_SUB(NOW(), INTERVAL %s DAY)")
-        values.append(days)
+        values = {
+            'work_order': work_order or None,
+            'operation': operation or None,
+            'parameter': parameter or None,
+            # Bound cutoff so the timestamp index can be used
+            'cutoff': frappe.utils.add_days(frappe.utils.now_datetime(), -cint(days))
+        }
         
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        def where_clause(alias=""):
+            return SPC_ANALYSIS_CONDITIONS.format(alias)
         
-        # Get measurement data
-        data_points = frappe.db.sql(f"""
-            SELECT 
+        # Per-parameter statistics (population standard deviation)
+        summary = frappe.db.sql(f"""
+            SELECT
                 parameter,
-                measurement_value,
-                timestamp,
-                work_order,
-                operation
+                COUNT(*) AS n,
+                AVG(measurement_value) AS mean,
+                STDDEV_POP(measurement_value) AS std_dev
             FROM `tabSPC Data Point`
-            WHERE {where_clause}
-            ORDER BY parameter, timestamp
+            WHERE {where_clause()}
+            GROUP BY parameter
         """, values, as_dict=True)
         
-        # Group by parameter for analysis
-        parameter_data = {}
-        for point in data_points:
-            param = point['parameter']
-            if param not in parameter_data:
-                parameter_data[param] = []
-            parameter_data[param].append({
-                'value': point['measurement_value'],
-                'timestamp': point['timestamp'],
-                'work_order': point['work_order'],
-                'operation': point['operation']
-            })
-        
-        # Calculate SPC statistics for each parameter
+        # Calculate control limits (3-sigma) for parameters with enough points
         analysis_results = {}
-        for param, values_list in parameter_data.items():
-            if len(values_list) >= 3:  # Minimum points for analysis
-                values_only = [v['value'] for v in values_list]
-                
-                # Calculate basic statistics
-                mean = sum(values_only) / len(values_only)
-                variance = sum([(x - mean) ** 2 for x in values_only]) / len(values_only)
-                std_dev = variance ** 0.5
-                
-                # Calculate control limits (3-sigma)
+        for row in summary:
+            if row.n >= 3:  # Minimum points for analysis
+                mean = flt(row.mean)
+                std_dev = flt(row.std_dev)
                 ucl = mean + (3 * std_dev)
                 lcl = mean - (3 * std_dev)
-                
-                # Identify out-of-control points
-                out_of_control = []
-                for i, v in enumerate(values_list):
-                    if v['value'] > ucl or v['value'] < lcl:
-                        out_of_control.append({
-                            'index': i,
-                            'value': v['value'],
-                            'timestamp': v['timestamp'],
-                            'work_order': v['work_order']
-                        })
-                
-                analysis_results[param] = {
+                analysis_results[row.parameter] = {
                     'mean': mean,
                     'std_dev': std_dev,
                     'ucl': ucl,
                     'lcl': lcl,
-                    'data_points': values_list,
-                    'out_of_control': out_of_control,
-                    'process_capability': calculate_process_capability(values_only, ucl, lcl)
+                    'out_of_control': [],
+                    'process_capability': get_process_capability(row.n, mean, std_dev, ucl, lcl)
                 }
         
+        if analysis_results:
+            # Identify out-of-control points; index is the point's position
+            # in the parameter's time-ordered series
+            out_of_control = frappe.db.sql(f"""
+                SELECT p.parameter, p.idx, p.measurement_value, p.timestamp, p.work_order
+                FROM (
+                    SELECT
+                        parameter, measurement_value, timestamp, work_order,
+                        ROW_NUMBER() OVER (PARTITION BY parameter ORDER BY timestamp) - 1 AS idx
+                    FROM `tabSPC Data Point`
+                    WHERE {where_clause()}
+                ) p
+                JOIN (
+                    SELECT parameter, AVG(measurement_value) AS mean,
+                        STDDEV_POP(measurement_value) AS std_dev
+                    FROM `tabSPC Data Point`
+                    WHERE {where_clause()}
+                    GROUP BY parameter
+                    HAVING COUNT(*) >= 3
+                ) s ON s.parameter = p.parameter
+                WHERE p.measurement_value > s.mean + 3 * s.std_dev
+                    OR p.measurement_value < s.mean - 3 * s.std_dev
+                ORDER BY p.parameter, p.timestamp
+            """, values, as_dict=True)
+            
+            for point in out_of_control:
+                analysis_results[point.parameter]['out_of_control'].append({
+                    'index': point.idx,
+                    'value': point.measurement_value,
+                    'timestamp': point.timestamp,
+                    'work_order': point.work_order
+                })
+        
+        if cint(include_points) and analysis_results:
+            for result in analysis_results.values():
+                result['data_points'] = []
+            
+            data_points = frappe.db.sql(f"""
+                SELECT parameter, measurement_value, timestamp, work_order, operation
+                FROM `tabSPC Data Point`
+                WHERE {where_clause()}
+                ORDER BY parameter, timestamp
+            """, values, as_dict=True)
+            
+            for point in data_points:
+                result = analysis_results.get(point.parameter)
+                if result:
+                    result['data_points'].append({
+                        'value': point.measurement_value,
+                        'timestamp': point.timestamp,
+                        'work_order': point.work_order,
+                        'operation': point.operation
+                    })
+            
+            # Run rules need the whole time-ordered series, so they are
+            # only evaluated when it has been loaded
+            for result in analysis_results.values():
+                points = result['data_points']
+                series = np.fromiter((flt(point['value']) for point in points),
+                                     dtype=np.float64, count=len(points))
+                result['rule_violations'] = detect_rule_violations(series, result['mean'], result['std_dev'])
+        
         return {
             'status': 'success',
             'analysis': analysis_results,
-            'total_points': len(data_points)
+            'total_points': sum(row.n for row in summary)
         }
         
     except Exception as e:
@@ -175,14 +307,96 @@ def get_spc_analysis(work_order=None, operation=None, parameter=None, days=30):
             'message': str(e)
         }
 
-def calculate_process_capability(values, ucl, lcl):
-    """Calculate process capability indices"""
-    if len(values) < 10:  # Need sufficient data
-        return None
+def compute_spc_analysis(rows, work_order=None):
+    """
+    SPC statistics per parameter for already fetched measurement rows
+    (dicts with parameter, value and timestamp): the analysis of
+    get_spc_analysis with run rule violations, without the data_points
+    series, which the caller already has
+    """
+    series = {}
+    for row in sorted(rows, key=lambda row: row['timestamp']):
+        series.setdefault(row['parameter'], []).append(row)
+    
+    analysis_results = {}
+    for param, points in series.items():
+        if len(points) >= 3:  # Minimum points for analysis
+            values = np.fromiter((point['value'] for point in points),
+                                 dtype=np.float64, count=len(points))
+            mean = float(values.mean())
+            std_dev = float(values.std())
+            ucl = mean + (3 * std_dev)
+            lcl = mean - (3 * std_dev)
+            
+            analysis_results[param] = {
+                'mean': mean,
+                'std_dev': std_dev,
+                'ucl': ucl,
+                'lcl': lcl,
+                'out_of_control': [{
+                    'index': int(i),
+                    'value': points[i]['value'],
+                    'timestamp': points[i]['timestamp'],
+                    'work_order': points[i].get('work_order', work_order)
+                } for i in np.flatnonzero((values > ucl) | (values < lcl))],
+                'rule_violations': detect_rule_violations(values, mean, std_dev),
+                'process_capability': get_process_capability(len(points), mean, std_dev, ucl, lcl)
+            }
+    
+    return analysis_results
+
+def _window_hits(mask, size, count):
+    """Indices closing a window of `size` points with at least `count` set in mask"""
+    if len(mask) < size:
+        return np.zeros(len(mask), dtype=bool)
+    hits = sliding_window_view(mask, size).sum(axis=1) >= count
+    return np.concatenate((np.zeros(size - 1, dtype=bool), hits))
+
+def detect_rule_violations(values, mean, std_dev):
+    """
+    Western Electric / Nelson run rules over a time-ordered series, as
+    vectorized masks on the sigma zones. Each rule maps to the indices of
+    the points that complete a violation.
+
+    - rule_1: one point beyond 3 sigma
+    - rule_2: nine points in a row on the same side of the mean
+    - rule_3: six points in a row steadily increasing or decreasing
+    - rule_5: two of three points beyond 2 sigma on the same side
+    - rule_6: four of five points beyond 1 sigma on the same side
+    """
+    if std_dev == 0:
+        return {}
+    
+    z = (values - mean) / std_dev
+    rising = np.concatenate(([False], np.diff(values) > 0))
+    falling = np.concatenate(([False], np.diff(values) < 0))
+    
+    rules = {
+        'rule_1': np.abs(z) > 3,
+        'rule_2': _window_hits(z > 0, 9, 9) | _window_hits(z < 0, 9, 9),
+        # Six points make five consecutive steps
+        'rule_3': _window_hits(rising, 5, 5) | _window_hits(falling, 5, 5),
+        'rule_5': _window_hits(z > 2, 3, 2) | _window_hits(z < -2, 3, 2),
+        'rule_6': _window_hits(z > 1, 5, 4) | _window_hits(z < -1, 5, 4)
+    }
+    return {rule: np.flatnonzero(mask).tolist() for rule, mask in rules.items() if mask.any()}
+
+def calculate_process_capability(values, ucl, lcl, mean=None, std_dev=None):
+    """
+    Calculate process capability indices. Callers that already have the
+    mean and (population) standard deviation of values can pass them in.
+    """
+    if mean is None or std_dev is None:
+        values = np.asarray(values, dtype=np.float64)
+        mean = float(values.mean()) if len(values) else 0.0
+        std_dev = float(values.std()) if len(values) else 0.0
     
-    # Calculate Cp and Cpk
-    mean = sum(values) / len(values)
-    std_dev = (sum([(x - mean) ** 2 for x in values]) / len(values)) ** 0.5
+    return get_process_capability(len(values), mean, std_dev, ucl, lcl)
+
+def get_process_capability(count, mean, std_dev, ucl, lcl):
+    """Calculate process capability indices from summary statistics"""
+    if count < 10:  # Need sufficient data
+        return None
     
     if std_dev == 0:
         return None
@@ -200,16 +414,78 @@ def calculate_process_capability(values, ucl, lcl):
         'interpretation': get_capability_interpretation(cp, cpk)
     }
 
+# Cpk thresholds (ascending) and the interpretation below, between and above them
+CAPABILITY_THRESHOLDS = (0.67, 1.0, 1.33)
+CAPABILITY_LABELS = (
+    "Poor capability - process improvement needed",
+    "Marginal capability",
+    "Good capability",
+    "Excellent capability"
+)
+
 def get_capability_interpretation(cp, cpk):
     """Get interpretation of capability indices"""
-    if cpk >= 1.33:
-        return "Excellent capability"
-    elif cpk >= 1.0:
-        return "Good capability"
-    elif cpk >= 0.67:
-        return "Marginal capability"
-    else:
-        return "Poor capability - process improvement needed"
+    return CAPABILITY_LABELS[bisect_right(CAPABILITY_THRESHOLDS, cpk)]
+
+def get_quality_report_rows(values, date_conditions):
+    """
+    Numeric measurements of a work order's completed operations. They come
+    from the SPC data points linked to each transaction through
+    reference_doc; on sites without that integration column, from the
+    measurements stored for each transaction (SFCTransaction.measurements).
+    """
+    if frappe.db.has_column('SPC Data Point', 'reference_doc'):
+        return frappe.db.sql(f"""
+            SELECT 
+                t.operation_sequence,
+                t.operation,
+                dp.parameter,
+                dp.measured_value AS value,
+                t.timestamp,
+                o.operator_name AS operator
+            FROM `tabSPC Data Point` dp
+            JOIN `tabSFC Transaction` t ON dp.reference_doc = t.name
+            LEFT JOIN `tabSFC Operator` o ON t.operator = o.name
+            WHERE t.work_order = %s 
+                AND t.transaction_type = 'Complete'
+                {date_conditions}
+            ORDER BY t.operation_sequence, t.timestamp
+        """, values, as_dict=True)
+    
+    transactions = frappe.db.sql(f"""
+        SELECT 
+            t.name,
+            t.operation_sequence,
+            t.operation,
+            t.quality_data,
+            t.timestamp,
+            o.operator_name
+        FROM `tabSFC Transaction` t
+        LEFT JOIN `tabSFC Operator` o ON t.operator = o.name
+        WHERE t.work_order = %s 
+            AND t.transaction_type = 'Complete'
+            {date_conditions}
+        ORDER BY t.operation_sequence, t.timestamp
+    """, values, as_dict=True)
+    
+    report_data = []
+    for record in transactions:
+        transaction = frappe.get_doc({
+            'doctype': 'SFC Transaction',
+            'name': record.name,
+            'quality_data': record.quality_data
+        })
+        for param, value in transaction.measurements.items():
+            if isinstance(value, (int, float)):
+                report_data.append({
+                    'operation_sequence': record.operation_sequence,
+                    'operation': record.operation,
+                    'parameter': param,
+                    'value': value,
+                    'timestamp': record.timestamp,
+                    'operator': record.operator_name
+                })
+    return report_data
 
 @frappe.whitelist()
 def generate_quality_report(work_order, date_from=None, date_to=None):
@@ -226,50 +502,16 @@ def generate_quality_report(work_order, date_from=None, date_to=None):
             date_conditions += " AND DATE(t.timestamp) <= %s"
             values.append(getdate(date_to))
         
-        # Get quality data
-        quality_data = frappe.db.sql(f"""
-            SELECT 
-                t.operation_sequence,
-                t.operation,
-                t.quality_data,
-                t.timestamp,
-                t.operator,
-                o.operator_name
-            FROM `tabSFC Transaction` t
-            LEFT JOIN `tabSFC Operator` o ON t.operator = o.name
-            WHERE t.work_order = %s 
-                AND t.transaction_type = 'Complete'
-                AND t.quality_data IS NOT NULL
-                {date_conditions}
-            ORDER BY t.operation_sequence, t.timestamp
-        """, values, as_dict=True)
-        
-        # Process quality data
-        report_data = []
-        for record in quality_data:
-            if record.quality_data:
-                try:
-                    measurements = json.loads(record.quality_data)
-                    for param, value in measurements.items():
-                        report_data.append({
-                            'operation_sequence': record.operation_sequence,
-                            'operation': record.operation,
-                            'parameter': param,
-                            'value': value,
-                            'timestamp': record.timestamp,
-                            'operator': record.operator_name
-                        })
-                except:
-                    continue
+        report_data = get_quality_report_rows(values, date_conditions)
         
-        # Get SPC analysis for this work order
-        spc_analysis = get_spc_analysis(work_order=work_order)
+        # SPC analysis for this work order, computed from the same rows
+        spc_analysis = compute_spc_analysis(report_data, work_order=work_order)
         
         return {
             'status': 'success',
             'work_order': work_order,
             'quality_data': report_data,
-            'spc_analysis': spc_analysis.get('analysis', {}),
+            'spc_analysis': spc_analysis,
             'date_range': {
                 'from': date_from,
                 'to': date_to
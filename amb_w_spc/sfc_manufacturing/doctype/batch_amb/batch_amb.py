@@ -77,24 +77,11 @@ class BatchAMB(Document):
 
     def validate_batch_hierarchy_integrity(self):
         """Validate and maintain batch hierarchy integrity"""
-        if self.custom_batch_level == "1":
-            # Level 1 batches should not have parent
-            if self.parent_batch_amb:
-                frappe.throw(_("Level 1 batches cannot have a parent batch"))
-        else:
-            # Sublots must have parent
-            if not self.parent_batch_amb:
-                frappe.throw(_("Parent Batch AMB is required for level {0} batches").format(
-                    self.custom_batch_level))
-            
-            # Validate parent exists and is correct level
-            if not frappe.db.exists("Batch AMB", self.parent_batch_amb):
-                frappe.throw(_("Parent Batch AMB {0} does not exist").format(self.parent_batch_amb))
-            
-            parent_level = frappe.db.get_value("Batch AMB", self.parent_batch_amb, "custom_batch_level")
-            if parent_level and int(parent_level) != int(self.custom_batch_level) - 1:
-                frappe.throw(_("Parent batch must be level {0} for this level {1} batch").format(
-                    int(self.custom_batch_level) - 1, self.custom_batch_level))
+        parent_level = None
+        if self.custom_batch_level != "1" and self.parent_batch_amb:
+            # Sublots created in a loop share parents, so read through the cache
+            parent_level = frappe.get_cached_value("Batch AMB", self.parent_batch_amb, "custom_batch_level")
+        check_batch_hierarchy(self.custom_batch_level, self.parent_batch_amb, parent_level)
 
     def sync_spc_parameters(self):
         """Sync SPC parameters between systems"""
@@ -490,6 +477,52 @@ class BatchAMB(Document):
             return None
 
 # Whitelisted methods for client-side calls
+def check_batch_hierarchy(batch_level, parent_batch, parent_level):
+    """
+    Hierarchy rules for one batch; parent_level is the parent batch's level,
+    or None if the parent does not exist
+    """
+    if batch_level == "1":
+        # Level 1 batches should not have parent
+        if parent_batch:
+            frappe.throw(_("Level 1 batches cannot have a parent batch"))
+    else:
+        # Sublots must have parent
+        if not parent_batch:
+            frappe.throw(_("Parent Batch AMB is required for level {0} batches").format(batch_level))
+        
+        # Validate parent exists and is correct level
+        if parent_level is None:
+            frappe.throw(_("Parent Batch AMB {0} does not exist").format(parent_batch))
+        
+        if parent_level and int(parent_level) != int(batch_level) - 1:
+            frappe.throw(_("Parent batch must be level {0} for this level {1} batch").format(
+                int(batch_level) - 1, batch_level))
+
+def validate_hierarchy_bulk(rows):
+    """
+    Validate the hierarchy of many batches (e.g. an import) with one query
+    for all their parents. Rows need custom_batch_level and parent_batch_amb.
+    """
+    parents = {row.get("parent_batch_amb") for row in rows if row.get("custom_batch_level") != "1"}
+    parents.discard(None)
+    parents.discard("")
+    parent_levels = dict(frappe.get_all("Batch AMB",
+        filters={"name": ["in", list(parents)]},
+        fields=["name", "custom_batch_level"],
+        as_list=True
+    )) if parents else {}
+    
+    for row in rows:
+        parent_batch = row.get("parent_batch_amb")
+        check_batch_hierarchy(row.get("custom_batch_level"), parent_batch, parent_levels.get(parent_batch))
+
+def on_doctype_update():
+    # Filters of BatchAMBIntegration.get_comprehensive_batch_report, with
+    # its creation ordering last
+    frappe.db.add_index("Batch AMB", ["custom_batch_level", "workflow_state", "item_to_manufacture",
+                                      "production_plant_name", "creation"])
+
 @frappe.whitelist()
 def get_erpnext_batch_info(batch_amb_name):
     """Get ERPNext Batch information for client-side"""
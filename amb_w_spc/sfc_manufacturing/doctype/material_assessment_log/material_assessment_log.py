@@ -9,7 +9,15 @@ from frappe import _
 from frappe.utils import flt, now_datetime
 import json
 
+from amb_w_spc.sfc_manufacturing.doctype.material_assessment_log_item.material_assessment_log_item import MaterialAssessmentLogItem
+
 class MaterialAssessmentLog(Document):
+	def before_validate(self):
+		"""Fetch item master data and compute shortages for all assessment rows"""
+		if self.items:
+			MaterialAssessmentLogItem.set_item_details(self.items)
+			MaterialAssessmentLogItem.set_shortage_status(self.items)
+	
 	def validate(self):
 		"""Validate the Material Assessment Log"""
 		if not self.assessment_date:
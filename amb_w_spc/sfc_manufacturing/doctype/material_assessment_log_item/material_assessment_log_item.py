@@ -4,25 +4,68 @@
 
 from __future__ import unicode_literals
 import frappe
+import numpy as np
 from frappe.model.document import Document
 
+# Row count above which shortage and status are computed with NumPy
+BULK_STATUS_THRESHOLD = 100
+
 class MaterialAssessmentLogItem(Document):
+	@staticmethod
+	def set_item_details(rows):
+		"""Fill item name and UOM on all rows with a single Item query"""
+		codes = {row.item_code for row in rows if row.item_code}
+		if not codes:
+			return
+		
+		items = {
+			item.name: item
+			for item in frappe.db.get_values(
+				"Item", {"name": ("in", list(codes))}, ["name", "item_name", "stock_uom"], as_dict=True
+			)
+		}
+		for row in rows:
+			item = items.get(row.item_code)
+			if item:
+				row.item_name = item.item_name
+				row.uom = item.stock_uom
+	
+	@staticmethod
+	def set_shortage_status(rows):
+		"""
+		Calculate shortage and status for all rows. Large tables (e.g. bulk
+		imports) are computed as arrays rather than row by row.
+		"""
+		rows = [row for row in rows if row.required_qty and row.available_qty]
+		if len(rows) <= BULK_STATUS_THRESHOLD:
+			for row in rows:
+				row.calculate_shortage()
+			return
+		
+		count = len(rows)
+		required = np.fromiter((row.required_qty for row in rows), dtype=np.float64, count=count)
+		available = np.fromiter((row.available_qty for row in rows), dtype=np.float64, count=count)
+		shortage = np.maximum(0, required - available)
+		status = np.where(available >= required, "Available", np.where(available > 0, "Partial", "Shortage"))
+		for row, shortage_qty, row_status in zip(rows, shortage.tolist(), status.tolist()):
+			row.shortage_qty = shortage_qty
+			row.status = row_status
+	
 	def validate(self):
 		"""Validate the Material Assessment Log Item"""
-		if self.item_code:
-			# Auto-fetch item name and UOM
-			item = frappe.get_doc("Item", self.item_code)
-			self.item_name = item.item_name
-			self.uom = item.stock_uom
-		
-		# Calculate shortage quantity
+		# Item name and UOM are set for all rows at once by the parent's
+		# before_validate (see set_item_details)
 		if self.required_qty and self.available_qty:
-			self.shortage_qty = max(0, self.required_qty - self.available_qty)
-			
-			# Determine status
-			if self.available_qty >= self.required_qty:
-				self.status = "Available"
-			elif self.available_qty > 0:
-				self.status = "Partial"
-			else:
-				self.status = "Shortage"
+			self.calculate_shortage()
+	
+	def calculate_shortage(self):
+		"""Calculate shortage quantity and status"""
+		self.shortage_qty = max(0, self.required_qty - self.available_qty)
+		
+		# Determine status
+		if self.available_qty >= self.required_qty:
+			self.status = "Available"
+		elif self.available_qty > 0:
+			self.status = "Partial"
+		else:
+			self.status = "Shortage"
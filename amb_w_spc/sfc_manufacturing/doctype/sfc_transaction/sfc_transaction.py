@@ -1,5 +1,34 @@
 import frappe
+import orjson
 from frappe.model.document import Document
 
 class SFCTransaction(Document):
-    pass
+    def validate(self):
+        # complete_operation callers may pass quality data as a dict
+        if isinstance(self.quality_data, (dict, list)):
+            self.quality_data = orjson.dumps(self.quality_data).decode()
+    
+    @property
+    def measurements(self):
+        """
+        Quality measurements for this transaction: quality_data when it was
+        set on completion, otherwise those of the Quality Inspection that
+        record_quality_measurement links to it
+        """
+        data = self.quality_data
+        if not data:
+            data = frappe.db.get_value("Quality Inspection", {
+                "reference_type": "SFC Transaction",
+                "reference_name": self.name
+            }, "measurements", order_by="creation desc")
+        if not data:
+            return {}
+        return orjson.loads(data) if isinstance(data, str) else data
+
+def on_doctype_update():
+    # Latest transaction of a given type for a work order operation
+    # (record_quality_measurement) is read straight off the index
+    frappe.db.add_index("SFC Transaction", ["work_order", "operation_sequence", "transaction_type", "timestamp"])
+    # Open start transaction probe in WorkOrderRouting.complete_operation;
+    # InnoDB appends the primary key, so fetching the name is index-only
+    frappe.db.add_index("SFC Transaction", ["work_order", "operation_sequence", "transaction_type", "status"])
@@ -3,36 +3,28 @@
 
 import unittest
 import frappe
+import orjson
 from frappe.utils import now_datetime, add_days
 
 class TestSFCTransaction(unittest.TestCase):
     
     def setUp(self):
         """Set up test data"""
+        # Everything a test writes, fixtures included, is rolled back in tearDown
+        frappe.db.savepoint("test_sp")
         self.work_order = self.create_test_work_order()
         self.workstation = self.create_test_workstation()
         self.operator = self.create_test_operator()
     
     def tearDown(self):
         """Clean up test data"""
-        # Delete test records
-        test_docs = [
-            'SFC Transaction',
-            'SFC Operator',
-            'Workstation',
-            'Work Order'
-        ]
-        
-        for doctype in test_docs:
-            records = frappe.get_all(doctype, {'name': ['like', 'TEST-%']})
-            for record in records:
-                try:
-                    frappe.delete_doc(doctype, record.name, force=True)
-                except:
-                    pass
+        frappe.db.rollback(save_point="test_sp")
     
     def create_test_work_order(self):
         """Create a test work order"""
+        if frappe.db.exists('Work Order', 'TEST-WO-001'):
+            return 'TEST-WO-001'
+        
         doc = frappe.get_doc({
             'doctype': 'Work Order',
             'name': 'TEST-WO-001',
@@ -40,38 +32,39 @@ class TestSFCTransaction(unittest.TestCase):
             'qty': 100,
             'company': 'Test Company'
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.insert(ignore_permissions=True)
         return doc.name
     
     def create_test_workstation(self):
         """Create a test workstation"""
-        doc = frappe.get_doc({
-            'doctype': 'Workstation',
+        if frappe.db.exists('Workstation', 'TEST-WS-001'):
+            return 'TEST-WS-001'
+        
+        # Plain master row, written directly: no controller hooks are needed
+        # and the fixed name is kept instead of being autonamed
+        doc = frappe.new_doc('Workstation')
+        doc.update({
             'name': 'TEST-WS-001',
             'workstation_name': 'Test Workstation 001',
             'hour_rate': 100
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.db_insert()
         return doc.name
     
     def create_test_operator(self):
         """Create a test operator"""
-        doc = frappe.get_doc({
-            'doctype': 'SFC Operator',
+        if frappe.db.exists('SFC Operator', 'TEST-OP-001'):
+            return 'TEST-OP-001'
+        
+        # Written directly like the workstation; SFC Operator validation only
+        # concerns employee links and skills, which the fixture has none of
+        doc = frappe.new_doc('SFC Operator')
+        doc.update({
             'name': 'TEST-OP-001',
             'operator_name': 'Test Operator 001',
             'is_active': 1
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.db_insert()
         return doc.name
     
     def test_create_sfc_transaction(self):
@@ -202,13 +195,13 @@ class TestSFCTransaction(unittest.TestCase):
             'transaction_type': 'Complete',
             'timestamp': now_datetime(),
             'status': 'Completed',
-            'quality_data': frappe.as_json(quality_data)
+            'quality_data': orjson.dumps(quality_data).decode()
         })
         
         doc.insert(ignore_permissions=True)
         self.assertTrue(doc.quality_data)
         
         # Verify quality data is properly stored
-        retrieved_data = frappe.parse_json(doc.quality_data)
+        retrieved_data = orjson.loads(doc.quality_data)
         self.assertEqual(retrieved_data['pass_fail'], 'Pass')
         self.assertEqual(retrieved_data['measurement_1'], 10.5)
\ No newline at end of file
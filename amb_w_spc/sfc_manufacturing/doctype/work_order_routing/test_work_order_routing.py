@@ -9,42 +9,31 @@ class TestWorkOrderRouting(unittest.TestCase):
     
     def setUp(self):
         """Set up test data"""
+        # Everything a test writes, fixtures included, is rolled back in tearDown
+        frappe.db.savepoint("test_sp")
         self.work_order = self.create_test_work_order()
         self.routing = self.create_test_routing()
     
     def tearDown(self):
         """Clean up test data"""
-        test_docs = [
-            'Work Order Routing',
-            'Work Order',
-            'Item',
-            'BOM'
-        ]
-        
-        for doctype in test_docs:
-            records = frappe.get_all(doctype, {'name': ['like', 'TEST-%']})
-            for record in records:
-                try:
-                    frappe.delete_doc(doctype, record.name, force=True)
-                except:
-                    pass
+        frappe.db.rollback(save_point="test_sp")
     
     def create_test_work_order(self):
         """Create a test work order"""
         # Create test item first
-        item_doc = frappe.get_doc({
-            'doctype': 'Item',
-            'item_code': 'TEST-ITEM-001',
-            'item_name': 'Test Item 001',
-            'item_group': 'All Item Groups',
-            'stock_uom': 'Nos'
-        })
-        try:
-            item_doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        if not frappe.db.exists('Item', 'TEST-ITEM-001'):
+            frappe.get_doc({
+                'doctype': 'Item',
+                'item_code': 'TEST-ITEM-001',
+                'item_name': 'Test Item 001',
+                'item_group': 'All Item Groups',
+                'stock_uom': 'Nos'
+            }).insert(ignore_permissions=True)
         
         # Create test work order
+        if frappe.db.exists('Work Order', 'TEST-WO-001'):
+            return 'TEST-WO-001'
+        
         doc = frappe.get_doc({
             'doctype': 'Work Order',
             'name': 'TEST-WO-001',
@@ -52,14 +41,15 @@ class TestWorkOrderRouting(unittest.TestCase):
             'qty': 100,
             'company': 'Test Company'
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.insert(ignore_permissions=True)
         return doc.name
     
     def create_test_routing(self):
         """Create a test work order routing"""
+        existing = frappe.db.exists('Work Order Routing', {'work_order': self.work_order})
+        if existing:
+            return frappe.get_doc('Work Order Routing', existing)
+        
         doc = frappe.get_doc({
             'doctype': 'Work Order Routing',
             'work_order': self.work_order,
@@ -89,11 +79,7 @@ class TestWorkOrderRouting(unittest.TestCase):
                 }
             ]
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            doc = frappe.get_doc('Work Order Routing', 
-                               {'work_order': self.work_order})
+        doc.insert(ignore_permissions=True)
         return doc
     
     def test_create_routing(self):
@@ -188,6 +174,27 @@ class TestWorkOrderRouting(unittest.TestCase):
         self.assertEqual(transaction.transaction_type, 'Start')
         self.assertEqual(transaction.status, 'In Progress')
     
+    def test_bulk_start_operations(self):
+        """Test starting several operations in one batch"""
+        operator = self.create_test_operator()
+        workstation = self.create_test_workstation()
+        
+        names = self.routing.bulk_start_operations([
+            (1, workstation, operator),
+            (2, workstation, operator)
+        ])
+        self.assertEqual(len(names), 2)
+        
+        for sequence, name in enumerate(names, 1):
+            transaction = frappe.get_doc('SFC Transaction', name)
+            self.assertEqual(transaction.operation_sequence, sequence)
+            self.assertEqual(transaction.transaction_type, 'Start')
+            self.assertEqual(transaction.status, 'In Progress')
+        
+        # Unknown sequences are rejected before anything is written
+        with self.assertRaises(frappe.ValidationError):
+            self.routing.bulk_start_operations([(99, workstation, operator)])
+    
     def test_complete_operation(self):
         """Test completing an operation"""
         # Create test operator and workstation
@@ -216,28 +223,28 @@ class TestWorkOrderRouting(unittest.TestCase):
     
     def create_test_operator(self):
         """Create a test operator"""
-        doc = frappe.get_doc({
-            'doctype': 'SFC Operator',
+        if frappe.db.exists('SFC Operator', 'TEST-OP-001'):
+            return 'TEST-OP-001'
+        
+        doc = frappe.new_doc('SFC Operator')
+        doc.update({
             'name': 'TEST-OP-001',
             'operator_name': 'Test Operator 001',
             'is_active': 1
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.db_insert()
         return doc.name
     
     def create_test_workstation(self):
         """Create a test workstation"""
-        doc = frappe.get_doc({
-            'doctype': 'Workstation',
+        if frappe.db.exists('Workstation', 'TEST-WS-001'):
+            return 'TEST-WS-001'
+        
+        doc = frappe.new_doc('Workstation')
+        doc.update({
             'name': 'TEST-WS-001',
             'workstation_name': 'Test Workstation 001',
             'hour_rate': 100
         })
-        try:
-            doc.insert(ignore_permissions=True)
-        except frappe.DuplicateEntryError:
-            pass
+        doc.db_insert()
         return doc.name
\ No newline at end of file
@@ -2,63 +2,122 @@
 # For license information, please see license.txt
 
 import frappe
+import numpy as np
 from frappe.model.document import Document
-from frappe.utils import now_datetime, flt
+from frappe.model.naming import parse_naming_series
+from frappe.utils import now_datetime, flt, cint
+
+SFC_TRANSACTION_SERIES = "SFC-TXN-.YYYY.-"
+
+# Operation count from which validate checks the routing with NumPy
+VECTORISED_OPERATIONS = 64
 
 class WorkOrderRouting(Document):
     def validate(self):
         """Validate the work order routing"""
-        self.validate_operation_sequence()
-        self.validate_time_estimates()
-        self.calculate_total_time()
+        self.validate_operations()
     
-    def validate_operation_sequence(self):
-        """Ensure operation sequence is unique and sequential"""
-        sequences = []
-        for operation in self.operations:
-            if operation.sequence in sequences:
-                frappe.throw(f"Duplicate sequence number {operation.sequence} found")
-            sequences.append(operation.sequence)
+    def validate_operations(self):
+        """
+        Check sequence uniqueness and time estimates, total the routing time
+        and rebuild the sequence index (see seq_index)
+        """
+        # Dropped first so a failed validation cannot leave a stale index
+        self.__dict__.pop("_seq_index", None)
+        if len(self.operations) >= VECTORISED_OPERATIONS:
+            sequences, first, last, total_setup, total_operation = self.check_operations_vectorised()
+        else:
+            sequences, first, last, total_setup, total_operation = self.check_operations()
+        
+        # Unique sequences are contiguous iff they span exactly len() numbers
+        if sequences and last - first + 1 != len(sequences):
+            missing = sorted(set(range(first, last + 1)).difference(sequences))
+            frappe.msgprint(f"Gap in sequence detected: missing {', '.join(map(str, missing))}")
         
-        # Check for gaps in sequence
-        sequences.sort()
-        for i, seq in enumerate(sequences):
-            if i > 0 and seq != sequences[i-1] + 1:
-                frappe.msgprint(f"Gap in sequence detected between {sequences[i-1]} and {seq}")
-    
-    def validate_time_estimates(self):
-        """Validate operation time estimates"""
-        for operation in self.operations:
-            if flt(operation.setup_time) < 0:
-                frappe.throw(f"Setup time cannot be negative for operation {operation.operation}")
-            if flt(operation.operation_time) <= 0:
-                frappe.throw(f"Operation time must be positive for operation {operation.operation}")
-    
-    def calculate_total_time(self):
-        """Calculate total estimated time for all operations"""
-        total_setup = sum([flt(op.setup_time) for op in self.operations])
-        total_operation = sum([flt(op.operation_time) for op in self.operations])
         self.total_setup_time = total_setup
         self.total_operation_time = total_operation
         self.total_estimated_time = total_setup + total_operation
+        self.__dict__["_seq_index"] = sequences
+    
+    def check_operations(self):
+        """
+        Row-by-row checks for validate_operations. Returns the sequence
+        index, the first and last sequence and the setup and operation totals.
+        """
+        sequences = {}
+        first = last = None
+        total_setup = total_operation = 0.0
+        for op in self.operations:
+            if op.sequence in sequences:
+                frappe.throw(f"Duplicate sequence number {op.sequence} found")
+            sequences[op.sequence] = op
+            if first is None or op.sequence < first:
+                first = op.sequence
+            if last is None or op.sequence > last:
+                last = op.sequence
+            
+            setup_time = flt(op.setup_time)
+            operation_time = flt(op.operation_time)
+            if setup_time < 0:
+                frappe.throw(f"Setup time cannot be negative for operation {op.operation}")
+            if operation_time <= 0:
+                frappe.throw(f"Operation time must be positive for operation {op.operation}")
+            total_setup += setup_time
+            total_operation += operation_time
+        
+        return sequences, first, last, total_setup, total_operation
+    
+    def check_operations_vectorised(self):
+        """check_operations for long routings, with the checks done on arrays"""
+        operations = self.operations
+        count = len(operations)
+        sequence = np.fromiter((cint(op.sequence) for op in operations), dtype=np.int64, count=count)
+        setup_time = np.fromiter((flt(op.setup_time) for op in operations), dtype=np.float64, count=count)
+        operation_time = np.fromiter((flt(op.operation_time) for op in operations), dtype=np.float64, count=count)
+        
+        unique, counts = np.unique(sequence, return_counts=True)
+        duplicates = unique[counts > 1]
+        if duplicates.size:
+            frappe.throw(f"Duplicate sequence number {duplicates[0]} found")
+        negative = np.flatnonzero(setup_time < 0)
+        if negative.size:
+            frappe.throw(f"Setup time cannot be negative for operation {operations[negative[0]].operation}")
+        not_positive = np.flatnonzero(operation_time <= 0)
+        if not_positive.size:
+            frappe.throw(f"Operation time must be positive for operation {operations[not_positive[0]].operation}")
+        
+        # np.unique sorts, so the ends are the first and last sequence
+        sequences = {op.sequence: op for op in operations}
+        return (sequences, int(unique[0]), int(unique[-1]),
+                float(setup_time.sum()), float(operation_time.sum()))
+    
+    @property
+    def seq_index(self):
+        """
+        Operations keyed by sequence number, built on first use or by
+        validate(). Rows appended since then change the count and trigger a
+        rebuild.
+        """
+        index = self.__dict__.get("_seq_index")
+        if index is None or len(index) != len(self.operations):
+            index = {op.sequence: op for op in self.operations}
+            self.__dict__["_seq_index"] = index
+        return index
     
     def get_next_operation(self, current_sequence):
         """Get the next operation in sequence"""
-        next_seq = current_sequence + 1
-        for operation in self.operations:
-            if operation.sequence == next_seq:
-                return operation
-        return None
+        return self.seq_index.get(current_sequence + 1)
     
     def get_operation_by_sequence(self, sequence):
         """Get operation by sequence number"""
-        for operation in self.operations:
-            if operation.sequence == sequence:
-                return operation
-        return None
+        return self.seq_index.get(sequence)
     
-    def start_operation(self, sequence, workstation, operator):
-        """Start an operation in the routing"""
+    def start_operation(self, sequence, workstation, operator, timestamp=None):
+        """
+        Start an operation in the routing. Batch callers can pass one
+        timestamp taken outside their loop instead of reading the clock
+        per operation.
+        """
         operation = self.get_operation_by_sequence(sequence)
         if not operation:
             frappe.throw(f"Operation with sequence {sequence} not found")
@@ -72,15 +131,48 @@ class WorkOrderRouting(Document):
             'workstation': workstation,
             'operator': operator,
             'transaction_type': 'Start',
-            'timestamp': now_datetime(),
+            'timestamp': timestamp or now_datetime(),
             'status': 'In Progress'
         })
         sfc_doc.insert()
         
         return sfc_doc.name
     
-    def complete_operation(self, sequence, actual_time=None, quality_data=None):
-        """Complete an operation in the routing"""
+    def bulk_start_operations(self, operations, timestamp=None):
+        """
+        Start many operations at once from an iterable of
+        (sequence, workstation, operator) tuples, writing the SFC Transactions
+        with multi-row inserts instead of one insert() per operation. Returns
+        the new transaction names in input order.
+        """
+        rows = []
+        for sequence, workstation, operator in operations:
+            operation = self.get_operation_by_sequence(sequence)
+            if not operation:
+                frappe.throw(f"Operation with sequence {sequence} not found")
+            rows.append((operation.operation, sequence, workstation, operator))
+        if not rows:
+            return []
+        
+        names = get_transaction_names(len(rows))
+        now = now_datetime()
+        user = frappe.session.user
+        frappe.db.bulk_insert(
+            'SFC Transaction',
+            ['name', 'creation', 'modified', 'owner', 'modified_by', 'naming_series', 'work_order',
+             'operation', 'operation_sequence', 'workstation', 'operator', 'transaction_type',
+             'timestamp', 'status'],
+            ((name, now, now, user, user, SFC_TRANSACTION_SERIES, self.work_order,
+              operation, sequence, workstation, operator, 'Start', timestamp or now, 'In Progress')
+             for name, (operation, sequence, workstation, operator) in zip(names, rows)),
+            chunk_size=1000
+        )
+        
+        return names
+    
+    def complete_operation(self, sequence, actual_time=None, quality_data=None, timestamp=None):
+        """Complete an operation in the routing (see start_operation for timestamp)"""
+        now = now_datetime()
         operation = self.get_operation_by_sequence(sequence)
         if not operation:
             frappe.throw(f"Operation with sequence {sequence} not found")
@@ -103,14 +195,35 @@ class WorkOrderRouting(Document):
             'operation': operation.operation,
             'operation_sequence': sequence,
             'transaction_type': 'Complete',
-            'timestamp': now_datetime(),
+            'timestamp': timestamp or now,
             'status': 'Completed',
             'actual_time': actual_time,
             'quality_data': quality_data
         })
         complete_doc.insert()
         
-        # Update start transaction status
-        frappe.db.set_value('SFC Transaction', start_transaction, 'status', 'Completed')
+        # Update start transaction status. A plain UPDATE by primary key;
+        # SFC Transactions are never read through the document cache, so
+        # set_value's query building and cache invalidation are not needed
+        frappe.db.sql(
+            "UPDATE `tabSFC Transaction` SET `status`=%s, `modified`=%s, `modified_by`=%s WHERE `name`=%s",
+            ('Completed', now, frappe.session.user, start_transaction)
+        )
         
-        return complete_doc.name
\ No newline at end of file
+        return complete_doc.name
+
+def get_transaction_names(count):
+    """
+    Reserve count consecutive SFC Transaction names from the naming series
+    with one locked update, as insert() would name them one at a time
+    """
+    prefix = parse_naming_series(SFC_TRANSACTION_SERIES)
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name`=%s FOR UPDATE", (prefix,))
+    if current and current[0][0] is not None:
+        start = cint(current[0][0])
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name`=%s", (count, prefix))
+    else:
+        start = 0
+        frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, count))
+    
+    return [f"{prefix}{start + i:05d}" for i in range(1, count + 1)]
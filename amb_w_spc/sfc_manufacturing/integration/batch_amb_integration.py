@@ -4,11 +4,17 @@
 import frappe
 from frappe import _
 from frappe.utils import nowdate, flt, now_datetime
+import json
 import logging
+from itertools import groupby
+from operator import itemgetter
 from typing import Dict, List, Optional, Any
 
 logger = logging.getLogger(__name__)
 
+# Seconds a batch's stock balance is shared between reads
+STOCK_BALANCE_TTL = 30
+
 class BatchAMBIntegration:
     """Complete integration controller for Batch AMB system"""
     
@@ -72,33 +78,73 @@ class BatchAMBIntegration:
             frappe.log_error(f"Error syncing Batch data: {str(e)}")
     
     @staticmethod
-    def get_stock_balance(batch_amb_name):
-        """Get stock balance for Batch AMB via ERPNext Batch"""
+    def get_stock_balance(batch_amb_name, item_code=None, batch_no=None, fresh=False):
+        """
+        Get stock balance for Batch AMB via ERPNext Batch. Callers holding
+        the batch pass its item and ERPNext Batch; otherwise they are read
+        from the database, not the document cache, which still has the
+        pre-save values while the batch's own on_update runs.
+
+        Balances are kept in the site cache for STOCK_BALANCE_TTL seconds,
+        so repeated reads of the same item/batch share one calculation;
+        fresh skips the cached value (and refreshes it) for callers that
+        write the balance back.
+        """
         try:
-            batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
-            if not batch_amb.erpnext_batch_reference:
-                return 0
+            if not batch_no:
+                batch_amb = frappe.db.get_value("Batch AMB", batch_amb_name,
+                    ["item_to_manufacture", "erpnext_batch_reference"], as_dict=True)
+                if not batch_amb or not batch_amb.erpnext_batch_reference:
+                    return 0
+                item_code, batch_no = batch_amb.item_to_manufacture, batch_amb.erpnext_batch_reference
+            
+            key = f"batch_stock_balance:{item_code}:{batch_no}"
+            if not fresh:
+                balance = frappe.cache().get_value(key)
+                if balance is not None:
+                    return balance
                 
             # Use ERPNext's stock balance calculation
             from erpnext.stock.utils import get_stock_balance
             
-            balance = get_stock_balance(
-                item_code=batch_amb.item_to_manufacture,
-                batch_no=batch_amb.erpnext_batch_reference
-            )
-            
-            return flt(balance)
+            balance = flt(get_stock_balance(item_code=item_code, batch_no=batch_no))
+            frappe.cache().set_value(key, balance, expires_in_sec=STOCK_BALANCE_TTL)
+            return balance
             
         except Exception as e:
             frappe.log_error(f"Error getting stock balance: {str(e)}")
             return 0
     
+    @staticmethod
+    def get_stock_balance_bulk(batch_amb_names):
+        """
+        Stock balances of many Batch AMB records, keyed by name, from one
+        aggregate over the Stock Ledger; batches without stock map to 0
+        """
+        if not batch_amb_names:
+            return {}
+        
+        balances = dict.fromkeys(batch_amb_names, 0)
+        balances.update(frappe.db.sql("""
+            SELECT b.name, SUM(sle.actual_qty)
+            FROM `tabBatch AMB` b
+            JOIN `tabStock Ledger Entry` sle
+                ON sle.batch_no = b.erpnext_batch_reference
+                AND sle.item_code = b.item_to_manufacture
+                AND sle.is_cancelled = 0
+            WHERE b.name IN %(names)s
+            GROUP BY b.name
+        """, {"names": tuple(batch_amb_names)}))
+        
+        return {name: flt(balance) for name, balance in balances.items()}
+    
     @staticmethod
     def update_batch_qty(batch_amb_name):
         """Update batch quantity from stock balance"""
         try:
             batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
-            stock_balance = BatchAMBIntegration.get_stock_balance(batch_amb_name)
+            stock_balance = BatchAMBIntegration.get_stock_balance(batch_amb_name,
+                batch_amb.item_to_manufacture, batch_amb.erpnext_batch_reference, fresh=True)
             
             if batch_amb.batch_qty != stock_balance:
                 batch_amb.db_set("batch_qty", stock_balance)
@@ -171,9 +217,10 @@ class BatchAMBIntegration:
                 })
                 history.insert()
                 batch_amb_doc.db_set("batch_processing_history", history.name)
+            else:
+                history = frappe.get_doc("Batch Processing History", batch_amb_doc.batch_processing_history)
             
             # Add history entry
-            history = frappe.get_doc("Batch Processing History", batch_amb_doc.batch_processing_history)
             history.append("processing_steps", {
                 "step_name": action,
                 "timestamp": now_datetime(),
@@ -194,13 +241,13 @@ class BatchAMBIntegration:
         # Build base query
         conditions = []
         if filters.get("batch_level"):
-            conditions.append(f"b.custom_batch_level = '{filters['batch_level']}'")
+            conditions.append("b.custom_batch_level = %(batch_level)s")
         if filters.get("workflow_state"):
-            conditions.append(f"b.workflow_state = '{filters['workflow_state']}'")
+            conditions.append("b.workflow_state = %(workflow_state)s")
         if filters.get("item_code"):
-            conditions.append(f"b.item_to_manufacture = '{filters['item_code']}'")
+            conditions.append("b.item_to_manufacture = %(item_code)s")
         if filters.get("plant"):
-            conditions.append(f"b.production_plant_name = '{filters['plant']}'")
+            conditions.append("b.production_plant_name = %(plant)s")
         
         where_clause = " AND ".join(conditions) if conditions else "1=1"
         
@@ -233,7 +280,7 @@ class BatchAMBIntegration:
             ORDER BY b.creation DESC
         """
         
-        return frappe.db.sql(query, as_dict=True)
+        return frappe.db.sql(query, filters, as_dict=True)
     
     @staticmethod
     def validate_batch_hierarchy_integrity(batch_amb_doc):
@@ -249,7 +296,7 @@ class BatchAMBIntegration:
                     batch_amb_doc.custom_batch_level))
             
             # Validate parent level
-            parent_level = frappe.db.get_value("Batch AMB", batch_amb_doc.parent_batch_amb, "custom_batch_level")
+            parent_level = frappe.get_cached_value("Batch AMB", batch_amb_doc.parent_batch_amb, "custom_batch_level")
             if parent_level and int(parent_level) != int(batch_amb_doc.custom_batch_level) - 1:
                 frappe.throw(_("Parent batch must be level {0} for this level {1} batch").format(
                     int(batch_amb_doc.custom_batch_level) - 1, batch_amb_doc.custom_batch_level))
@@ -259,17 +306,17 @@ class BatchAMBIntegration:
         """Get batch tree data for widget display"""
         conditions = ["b.custom_batch_level IN ('1', '2', '3')"]
         if plant:
-            conditions.append(f"b.production_plant_name = '{plant}'")
+            conditions.append("b.production_plant_name = %(plant)s")
         
         where_clause = " AND ".join(conditions)
         
+        # Plant first, so rows come back already grouped by it
         query = f"""
             SELECT 
+                b.production_plant_name as plant,
                 b.name as batch_code,
-                b.custom_generated_batch_name as batch_name,
                 b.custom_batch_level,
                 b.workflow_state as quality_status,
-                b.production_plant_name as plant,
                 b.batch_qty as quantity,
                 b.item_to_manufacture as item_code
             FROM `tabBatch AMB` b
@@ -277,34 +324,44 @@ class BatchAMBIntegration:
             ORDER BY b.production_plant_name, b.custom_batch_level, b.creation
         """
         
-        batches = frappe.db.sql(query, as_dict=True)
+        fields = ("batch_code", "custom_batch_level", "quality_status", "quantity", "item_code")
+        rows = frappe.db.sql(query, {"plant": plant})
         
-        # Group by plant
+        # Group by plant; setdefault because a case-insensitive collation can
+        # interleave names that differ only in case
         plant_data = {}
-        for batch in batches:
-            plant = batch.pop('plant', 'Unknown Plant')
-            if plant not in plant_data:
-                plant_data[plant] = []
-            plant_data[plant].append(batch)
+        for plant, batches in groupby(rows, key=itemgetter(0)):
+            plant_data.setdefault(plant, []).extend(dict(zip(fields, row[1:])) for row in batches)
         
         return plant_data
 
+# Ledger entries shown per batch, and how long (seconds) a batch's latest
+# entries are shared between requests
+LEDGER_ENTRY_LIMIT = 50
+LEDGER_ENTRY_TTL = 30
+
 @frappe.whitelist()
 def get_batch_stock_info(batch_amb_name):
     """Get comprehensive stock information for a batch"""
     try:
         batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
         
-        stock_balance = BatchAMBIntegration.get_stock_balance(batch_amb_name)
+        stock_balance = BatchAMBIntegration.get_stock_balance(batch_amb_name,
+            batch_amb.item_to_manufacture, batch_amb.erpnext_batch_reference)
         
-        # Get stock ledger entries
-        ledger_entries = frappe.db.sql("""
-            SELECT posting_date, voucher_type, voucher_no, actual_qty, qty_after_transaction, warehouse
-            FROM `tabStock Ledger Entry`
-            WHERE batch_no = %s AND item_code = %s
-            ORDER BY posting_date DESC, creation DESC
-            LIMIT 50
-        """, (batch_amb.erpnext_batch_reference, batch_amb.item_to_manufacture), as_dict=True)
+        # Get stock ledger entries; users looking at the same batch within
+        # a few seconds share one query
+        cache_key = f"sle:last{LEDGER_ENTRY_LIMIT}:{batch_amb.item_to_manufacture}:{batch_amb.erpnext_batch_reference}"
+        ledger_entries = frappe.cache().get_value(cache_key)
+        if ledger_entries is None:
+            ledger_entries = frappe.db.sql("""
+                SELECT posting_date, voucher_type, voucher_no, actual_qty, qty_after_transaction, warehouse
+                FROM `tabStock Ledger Entry`
+                WHERE batch_no = %s AND item_code = %s
+                ORDER BY posting_date DESC, creation DESC
+                LIMIT %s
+            """, (batch_amb.erpnext_batch_reference, batch_amb.item_to_manufacture, LEDGER_ENTRY_LIMIT), as_dict=True)
+            frappe.cache().set_value(cache_key, ledger_entries, expires_in_sec=LEDGER_ENTRY_TTL)
         
         return {
             'batch_amb': batch_amb_name,
@@ -319,34 +376,165 @@ def get_batch_stock_info(batch_amb_name):
         frappe.log_error(f"Error getting batch stock info: {str(e)}")
         return {'error': str(e)}
 
+@frappe.whitelist()
+def get_batch_stock_info_bulk(batch_amb_names):
+    """
+    get_batch_stock_info for many batches (a list or JSON list of names),
+    keyed by batch name, reading the latest ledger entries of all of them
+    in one windowed scan. Balances come from the Stock Ledger totals (see
+    get_stock_balance_bulk).
+    """
+    if isinstance(batch_amb_names, str):
+        batch_amb_names = json.loads(batch_amb_names)
+    if not batch_amb_names:
+        return {}
+    
+    batches = frappe.get_all("Batch AMB",
+        filters={"name": ["in", batch_amb_names]},
+        fields=["name", "erpnext_batch_reference", "item_to_manufacture"]
+    )
+    balances = BatchAMBIntegration.get_stock_balance_bulk([batch.name for batch in batches])
+    
+    entries = {}
+    batch_nos = tuple({batch.erpnext_batch_reference for batch in batches if batch.erpnext_batch_reference})
+    if batch_nos:
+        for entry in frappe.db.sql("""
+            SELECT batch_no, item_code, posting_date, voucher_type, voucher_no,
+                actual_qty, qty_after_transaction, warehouse
+            FROM (
+                SELECT batch_no, item_code, posting_date, voucher_type, voucher_no,
+                    actual_qty, qty_after_transaction, warehouse,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY batch_no, item_code
+                        ORDER BY posting_date DESC, creation DESC
+                    ) AS rn
+                FROM `tabStock Ledger Entry`
+                WHERE batch_no IN %(batch_nos)s
+            ) sle
+            WHERE rn <= %(limit)s
+            ORDER BY batch_no, item_code, rn
+        """, {"batch_nos": batch_nos, "limit": LEDGER_ENTRY_LIMIT}, as_dict=True):
+            entries.setdefault((entry.pop("item_code"), entry.pop("batch_no")), []).append(entry)
+    
+    result = {}
+    for batch in batches:
+        ledger_entries = entries.get((batch.item_to_manufacture, batch.erpnext_batch_reference), [])
+        result[batch.name] = {
+            'batch_amb': batch.name,
+            'erpnext_batch': batch.erpnext_batch_reference,
+            'item_code': batch.item_to_manufacture,
+            'current_stock': balances.get(batch.name, 0),
+            'ledger_entries': ledger_entries,
+            'warehouses': list({entry.warehouse for entry in ledger_entries})
+        }
+    
+    return result
+
+# Batches synced per transaction by the background sync job
+SYNC_CHUNK_SIZE = 200
+
 @frappe.whitelist()
 def sync_batch_systems(batch_amb_name):
-    """Manual sync of all batch systems"""
-    try:
-        batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
+    """
+    Manual sync of all batch systems for one batch, or a JSON list of
+    batches. The sync runs as a background job once the request commits;
+    the job id is returned and progress is published as batch_sync_progress.
+    """
+    batch_amb_names = batch_amb_name
+    if isinstance(batch_amb_names, str):
+        batch_amb_names = json.loads(batch_amb_names) if batch_amb_names.startswith("[") else [batch_amb_names]
+    
+    job_id = f"sync_batch_systems::{frappe.generate_hash(length=10)}"
+    frappe.enqueue(
+        "amb_w_spc.sfc_manufacturing.integration.batch_amb_integration._sync_batch_systems_job",
+        batch_amb_names=batch_amb_names,
+        queue="long",
+        job_id=job_id,
+        enqueue_after_commit=True
+    )
+    
+    return {'success': True, 'job_id': job_id}
+
+def _sync_batch_systems_job(batch_amb_names):
+    """Background job for sync_batch_systems, committing every SYNC_CHUNK_SIZE batches"""
+    total = len(batch_amb_names)
+    failed = []
+    for start in range(0, total, SYNC_CHUNK_SIZE):
+        for name in batch_amb_names[start:start + SYNC_CHUNK_SIZE]:
+            # A failed batch is rolled back alone and the chunk carries on
+            frappe.db.savepoint("batch_sync")
+            try:
+                _sync_one_batch(name)
+            except Exception as e:
+                frappe.db.rollback(save_point="batch_sync")
+                frappe.log_error(f"Error syncing batch systems for {name}: {str(e)}")
+                failed.append(name)
         
-        # Sync ERPNext Batch
-        if not batch_amb.erpnext_batch_reference and batch_amb.custom_batch_level == "1":
-            BatchAMBIntegration.create_erpnext_batch(batch_amb)
+        frappe.db.commit()
+        frappe.publish_realtime("batch_sync_progress", {
+            'done': min(start + SYNC_CHUNK_SIZE, total),
+            'total': total,
+            'failed': failed
+        }, user=frappe.session.user)
+
+# Batch AMB columns read by the sync helpers
+BATCH_SYNC_FIELDS = [
+    "name", "custom_batch_level", "erpnext_batch_reference", "spc_batch_record",
+    "batch_processing_history", "item_to_manufacture", "wo_item_name",
+    "tds_item_name", "expiry_date", "manufacturing_date", "batch_qty"
+]
+
+def _sync_one_batch(batch_amb_name):
+    """Sync ERPNext Batch, SPC record, stock quantity and history for one batch"""
+    batch_amb = frappe.db.get_value("Batch AMB", batch_amb_name, BATCH_SYNC_FIELDS, as_dict=True)
+    if not batch_amb:
+        frappe.throw(_("Batch AMB {0} not found").format(batch_amb_name), frappe.DoesNotExistError)
+    
+    # Already linked batches only need the columns above; creating a linked
+    # record writes its link back through db_set, which needs the document
+    if not batch_amb.batch_processing_history or (batch_amb.custom_batch_level == "1"
+            and not (batch_amb.erpnext_batch_reference and batch_amb.spc_batch_record)):
+        batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
+    
+    # Sync ERPNext Batch
+    if not batch_amb.erpnext_batch_reference and batch_amb.custom_batch_level == "1":
+        BatchAMBIntegration.create_erpnext_batch(batch_amb)
+    else:
+        BatchAMBIntegration.sync_batch_data(batch_amb)
+    
+    # Sync SPC Record
+    if batch_amb.custom_batch_level == "1":
+        if not batch_amb.spc_batch_record:
+            BatchAMBIntegration.create_spc_batch_record(batch_amb)
         else:
-            BatchAMBIntegration.sync_batch_data(batch_amb)
-        
-        # Sync SPC Record
-        if batch_amb.custom_batch_level == "1":
-            if not batch_amb.spc_batch_record:
-                BatchAMBIntegration.create_spc_batch_record(batch_amb)
-            else:
-                BatchAMBIntegration.sync_spc_parameters(batch_amb)
-        
-        # Update stock quantity
-        BatchAMBIntegration.update_batch_qty(batch_amb_name)
-        
-        # Add to processing history
-        BatchAMBIntegration.create_batch_processing_history(batch_amb, "Manual System Sync")
-        
-        frappe.msgprint(_("All batch systems synchronized successfully"))
-        return {'success': True}
-        
-    except Exception as e:
-        frappe.log_error(f"Error syncing batch systems: {str(e)}")
-        return {'success': False, 'error': str(e)}
+            BatchAMBIntegration.sync_spc_parameters(batch_amb)
+    
+    # Update stock quantity
+    BatchAMBIntegration.update_batch_qty(batch_amb_name)
+    
+    # Add to processing history
+    BatchAMBIntegration.create_batch_processing_history(batch_amb, "Manual System Sync")
+
+def update_all_batch_qty(batch_amb_names=None):
+    """
+    Set batch_qty of every Batch AMB (or only the given ones) to its Stock
+    Ledger balance with a single UPDATE ... JOIN, for migrations and nightly
+    syncs. Only rows whose quantity changed are written; batches without
+    ledger entries are left as they are.
+    """
+    condition = "AND b.name IN %(names)s" if batch_amb_names else ""
+    frappe.db.sql(f"""
+        UPDATE `tabBatch AMB` b
+        JOIN (
+            SELECT batch_no, item_code, SUM(actual_qty) AS qty
+            FROM `tabStock Ledger Entry`
+            WHERE is_cancelled = 0
+            GROUP BY batch_no, item_code
+        ) s ON s.batch_no = b.erpnext_batch_reference AND s.item_code = b.item_to_manufacture
+        SET b.batch_qty = s.qty, b.modified = %(now)s, b.modified_by = %(user)s
+        WHERE NOT (b.batch_qty <=> s.qty) {condition}
+    """, {
+        "names": tuple(batch_amb_names or ()),
+        "now": now_datetime(),
+        "user": frappe.session.user
+    })
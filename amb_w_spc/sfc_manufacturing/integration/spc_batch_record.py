@@ -3,7 +3,31 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import nowdate, now_datetime
 
+# Batch AMB workflow state for each SPC batch status
+_SPC_TO_AMB_STATE = {
+    "Approved": "Quality Approved",
+    "Released": "Quality Approved",
+    "Rejected": "Rejected",
+    "Hold": "SPC Hold",
+    "Complete": "Pending QC Review"
+}
+
 class SPCBatchRecord(Document):
+    # (fieldname, label) of the fields every record must have; field values
+    # live in the instance __dict__, so they are read from it directly
+    _REQUIRED = (
+        ("batch_number", "Batch Number"),
+        ("product_code", "Product Code"),
+        ("plant", "Plant"),
+        ("production_date", "Production Date"),
+        ("batch_size", "Batch Size"),
+        ("production_supervisor", "Production Supervisor"),
+        ("quality_inspector", "Quality Inspector"),
+        ("raw_materials_used", "Raw Materials Used"),
+        ("equipment_used", "Equipment Used"),
+        ("batch_status", "Batch Status"),
+    )
+    
     def validate(self):
         self.validate_batch_reference()
         self.calculate_overall_status()
@@ -15,21 +39,15 @@ class SPCBatchRecord(Document):
     def validate_batch_reference(self):
         """Validate that batch reference exists and is level 1"""
         if self.batch_amb_reference:
-            batch_level = frappe.db.get_value("Batch AMB", self.batch_amb_reference, "custom_batch_level")
+            batch_level = frappe.get_cached_value("Batch AMB", self.batch_amb_reference, "custom_batch_level")
             if batch_level != "1":
                 frappe.throw("SPC Batch Record can only be created for Level 1 batches")
     
     def validate_required_fields(self):
-        """Validate required fields"""
-        required_fields = [
-            'batch_number', 'product_code', 'plant', 'production_date', 
-            'batch_size', 'production_supervisor', 'quality_inspector',
-            'raw_materials_used', 'equipment_used', 'batch_status'
-        ]
-        
-        for field in required_fields:
-            if not self.get(field):
-                frappe.throw(f"Field '{self.meta.get_label(field)}' is required")
+        """Validate required fields, reporting all missing ones together"""
+        missing = [label for field, label in self._REQUIRED if not self.__dict__.get(field)]
+        if missing:
+            frappe.throw([f"Field '{label}' is required" for label in missing], as_list=True)
     
     def calculate_overall_status(self):
         """Calculate overall status based on parameters"""
@@ -54,23 +72,17 @@ class SPCBatchRecord(Document):
         """Update related Batch AMB status"""
         if self.batch_amb_reference:
             try:
-                batch_amb = frappe.get_doc("Batch AMB", self.batch_amb_reference)
-                
-                # Map SPC status to Batch AMB workflow state
-                status_mapping = {
-                    "Approved": "Quality Approved",
-                    "Released": "Quality Approved", 
-                    "Rejected": "Rejected",
-                    "Hold": "SPC Hold",
-                    "Complete": "Pending QC Review"
-                }
+                # Only the workflow state is needed unless it changes
+                workflow_state = frappe.get_cached_value("Batch AMB", self.batch_amb_reference, "workflow_state")
                 
-                if self.batch_status in status_mapping:
-                    new_state = status_mapping[self.batch_status]
-                    if batch_amb.workflow_state != new_state:
-                        batch_amb.db_set("workflow_state", new_state)
+                if self.batch_status in _SPC_TO_AMB_STATE:
+                    new_state = _SPC_TO_AMB_STATE[self.batch_status]
+                    if workflow_state != new_state:
+                        frappe.db.set_value("Batch AMB", self.batch_amb_reference, "workflow_state", new_state)
                         
-                        # Add to processing history
+                        # Add to processing history (which may link a new
+                        # history record back to the batch, so needs the doc)
+                        batch_amb = frappe.get_doc("Batch AMB", self.batch_amb_reference)
                         from amb_w_spc.sfc_manufacturing.integration.batch_amb_integration import BatchAMBIntegration
                         BatchAMBIntegration.create_batch_processing_history(
                             batch_amb, 
@@ -84,7 +96,8 @@ class SPCBatchRecord(Document):
 @frappe.whitelist()
 def create_spc_record_for_batch(batch_amb_name):
     """Create SPC Batch Record for a Batch AMB"""
-    batch_amb = frappe.get_doc("Batch AMB", batch_amb_name)
+    # Read-only here; the back link below is a plain column update
+    batch_amb = frappe.get_cached_doc("Batch AMB", batch_amb_name)
     
     if batch_amb.custom_batch_level != "1":
         frappe.throw("SPC Batch Record can only be created for Level 1 batches")
@@ -107,7 +120,7 @@ def create_spc_record_for_batch(batch_amb_name):
     spc_record.insert()
     
     # Link back to Batch AMB
-    batch_amb.db_set("spc_batch_record", spc_record.name)
+    frappe.db.set_value("Batch AMB", batch_amb_name, "spc_batch_record", spc_record.name)
     
     frappe.msgprint(f"SPC Batch Record {spc_record.name} created successfully")
     return spc_record.name
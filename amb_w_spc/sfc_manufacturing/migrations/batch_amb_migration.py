@@ -6,6 +6,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Batches whose integration records are linked and committed together
+MIGRATION_CHUNK_SIZE = 200
+
 def run_batch_amb_migration():
     """Run comprehensive migration for Batch AMB system"""
     try:
@@ -115,67 +118,109 @@ def migrate_existing_batches():
     """Migrate existing Batch AMB records"""
     logger.info("Migrating existing batches...")
     
-    # Get all existing Batch AMB records
-    batches = frappe.get_all("Batch AMB", fields=['name', 'custom_batch_level', 'item_to_manufacture'])
+    # Each default is one UPDATE over the matching rows rather than a
+    # get_doc and db_set per batch
     
-    for batch in batches:
-        try:
-            batch_doc = frappe.get_doc("Batch AMB", batch.name)
-            
-            # Set default workflow state if not set
-            if not batch_doc.workflow_state:
-                batch_doc.db_set('workflow_state', 'Draft')
-            
-            # Set manufacturing date if not set for Level 1 batches
-            if batch_doc.custom_batch_level == "1" and not batch_doc.manufacturing_date:
-                batch_doc.db_set('manufacturing_date', nowdate())
-            
-            # Update integration status
-            batch_doc.db_set('integration_status', 'Pending')
-            
-            logger.info(f"Migrated batch: {batch.name}")
-            
-        except Exception as e:
-            logger.error(f"Error migrating batch {batch.name}: {str(e)}")
-            continue
+    # Set default workflow state if not set
+    frappe.db.set_value("Batch AMB", {"workflow_state": ("is", "not set")}, "workflow_state", "Draft")
+    
+    # Set manufacturing date if not set for Level 1 batches
+    frappe.db.set_value("Batch AMB", {
+        "custom_batch_level": "1",
+        "manufacturing_date": ("is", "not set")
+    }, "manufacturing_date", nowdate())
+    
+    # Update integration status
+    frappe.db.set_value("Batch AMB", {"name": ("is", "set")}, "integration_status", "Pending")
+    
+    logger.info(f"Migrated {frappe.db.count('Batch AMB')} batches")
 
 def create_integration_records():
     """Create integration records for existing batches"""
     logger.info("Creating integration records...")
     
-    # Get Level 1 batches that need integration records
-    level1_batches = frappe.get_all("Batch AMB", 
-        filters={'custom_batch_level': '1'},
-        fields=['name', 'item_to_manufacture', 'manufacturing_date', 'expiry_date']
-    )
+    # Get Level 1 batches that need integration records, with every column
+    # the SPC record and history builders use; only the ERPNext Batch path,
+    # which goes through BatchAMBIntegration, still loads the document.
+    # Records created by an earlier, interrupted run before their back
+    # reference was written are found by their own link to the batch, so a
+    # resumed migration relinks them instead of creating duplicates.
+    # Processing histories link back through batch_amb_reference, which
+    # only the history DocType created by this migration has.
+    history_link = frappe.db.has_column("Batch Processing History", "batch_amb_reference")
+    history_join = """
+        LEFT JOIN (
+            SELECT batch_amb_reference, MIN(name) AS name
+            FROM `tabBatch Processing History`
+            GROUP BY batch_amb_reference
+        ) bph ON bph.batch_amb_reference = b.name
+    """ if history_link else ""
+    level1_batches = frappe.db.sql(f"""
+        SELECT
+            b.name, b.item_to_manufacture, b.manufacturing_date, b.batch_qty,
+            b.erpnext_batch_reference, b.spc_batch_record, b.batch_processing_history,
+            eb.name AS existing_erpnext_batch,
+            sbr.name AS existing_spc_batch_record,
+            {"bph.name" if history_link else "NULL"} AS existing_processing_history
+        FROM `tabBatch AMB` b
+        LEFT JOIN (
+            SELECT reference_name, MIN(name) AS name
+            FROM `tabBatch`
+            WHERE reference_doctype = 'Batch AMB'
+            GROUP BY reference_name
+        ) eb ON eb.reference_name = b.name
+        LEFT JOIN (
+            SELECT batch_number, MIN(name) AS name
+            FROM `tabSPC Batch Record`
+            GROUP BY batch_number
+        ) sbr ON sbr.batch_number = b.name
+        {history_join}
+        WHERE b.custom_batch_level = '1'
+    """, as_dict=True)
     
-    for batch in level1_batches:
+    # Back-references and statuses are collected per batch and written with
+    # one bulk update per chunk instead of several db_set calls per batch;
+    # each chunk is committed with its links, so an interrupted run keeps
+    # what it created linked
+    sync_date = now_datetime()
+    updates = {}
+    for i, batch in enumerate(level1_batches, 1):
+        batch_updates = updates[batch.name] = {}
         try:
-            batch_doc = frappe.get_doc("Batch AMB", batch.name)
-            
             # Create ERPNext Batch if not exists
-            if not batch_doc.erpnext_batch_reference:
-                create_erpnext_batch_for_existing(batch_doc)
+            if batch.erpnext_batch_reference:
+                pass
+            elif batch.existing_erpnext_batch:
+                batch_updates['erpnext_batch_reference'] = batch.existing_erpnext_batch
+            else:
+                create_erpnext_batch_for_existing(frappe.get_doc("Batch AMB", batch.name))
             
             # Create SPC Batch Record if not exists  
-            if not batch_doc.spc_batch_record:
-                create_spc_record_for_existing(batch_doc)
+            if not batch.spc_batch_record:
+                batch_updates['spc_batch_record'] = (batch.existing_spc_batch_record
+                    or create_spc_record_for_existing(batch))
             
             # Create Processing History if not exists
-            if not batch_doc.batch_processing_history:
-                create_processing_history_for_existing(batch_doc)
+            if not batch.batch_processing_history:
+                batch_updates['batch_processing_history'] = (batch.existing_processing_history
+                    or create_processing_history_for_existing(batch))
             
             # Update integration status
-            batch_doc.db_set('integration_status', 'Completed')
-            batch_doc.db_set('last_sync_date', now_datetime())
+            batch_updates['integration_status'] = 'Completed'
+            batch_updates['last_sync_date'] = sync_date
             
             logger.info(f"Created integration records for: {batch.name}")
             
         except Exception as e:
             logger.error(f"Error creating integration records for {batch.name}: {str(e)}")
-            batch_doc.db_set('integration_status', 'Error')
-            batch_doc.db_set('sync_errors', str(e))
-            continue
+            # References of records created before the failure are kept
+            batch_updates['integration_status'] = 'Error'
+            batch_updates['sync_errors'] = str(e)
+        
+        if updates and (i % MIGRATION_CHUNK_SIZE == 0 or i == len(level1_batches)):
+            frappe.db.bulk_update("Batch AMB", updates)
+            frappe.db.commit()
+            updates = {}
 
 def create_erpnext_batch_for_existing(batch_doc):
     """Create ERPNext Batch for existing Batch AMB records"""
@@ -186,43 +231,43 @@ def create_erpnext_batch_for_existing(batch_doc):
         logger.error(f"Error creating ERPNext batch for {batch_doc.name}: {str(e)}")
         raise
 
-def create_spc_record_for_existing(batch_doc):
-    """Create SPC Batch Record for existing Batch AMB records"""
+def create_spc_record_for_existing(batch):
+    """Create SPC Batch Record for an existing Batch AMB record and return its name"""
     try:
         spc_record = frappe.new_doc("SPC Batch Record")
         spc_record.update({
-            "batch_amb_reference": batch_doc.name,
-            "batch_number": batch_doc.name,
-            "product_code": batch_doc.item_to_manufacture,
-            "production_date": batch_doc.manufacturing_date or nowdate(),
-            "batch_size": batch_doc.batch_qty or 0,
+            "batch_amb_reference": batch.name,
+            "batch_number": batch.name,
+            "product_code": batch.item_to_manufacture,
+            "production_date": batch.manufacturing_date or nowdate(),
+            "batch_size": batch.batch_qty or 0,
             "batch_status": "In Process"
         })
         spc_record.insert()
         
-        batch_doc.db_set("spc_batch_record", spc_record.name)
+        return spc_record.name
         
     except Exception as e:
-        logger.error(f"Error creating SPC record for {batch_doc.name}: {str(e)}")
+        logger.error(f"Error creating SPC record for {batch.name}: {str(e)}")
         raise
 
-def create_processing_history_for_existing(batch_doc):
-    """Create Processing History for existing Batch AMB records"""
+def create_processing_history_for_existing(batch):
+    """Create Processing History for an existing Batch AMB record and return its name"""
     try:
         history = frappe.new_doc("Batch Processing History")
         history.update({
-            "batch_amb_reference": batch_doc.name,
-            "batch_code": batch_doc.name,
-            "item_code": batch_doc.item_to_manufacture,
+            "batch_amb_reference": batch.name,
+            "batch_code": batch.name,
+            "item_code": batch.item_to_manufacture,
             "start_date": now_datetime(),
             "status": "Completed"
         })
         history.insert()
         
-        batch_doc.db_set("batch_processing_history", history.name)
+        return history.name
         
     except Exception as e:
-        logger.error(f"Error creating processing history for {batch_doc.name}: {str(e)}")
+        logger.error(f"Error creating processing history for {batch.name}: {str(e)}")
         raise
 
 def validate_migration():
@@ -8,15 +8,20 @@ def create_modules_v15():
         "real_time_monitoring", "sensor_management", "system_integration", "fda_compliance"
     ]
     
-    for module in modules:
-        if not frappe.db.exists("Module Def", module):
-            print(f"Creating module: {module}")
-            frappe.db.sql("""
-                INSERT INTO `tabModule Def` 
-                (`name`, `creation`, `modified`, `modified_by`, `owner`, 
-                 `docstatus`, `idx`, `module_name`, `custom`, `app_name`)
-                VALUES (%s, NOW(), NOW(), %s, %s, %s, %s, %s, %s, %s)
-            """, (module, "Administrator", "Administrator", 0, 0, module, 0, "amb_w_spc"))
+    # One query for the existing modules and one multi-row INSERT for the rest
+    existing = set(frappe.get_all("Module Def", filters={"name": ["in", modules]}, pluck="name"))
+    missing = [module for module in modules if module not in existing]
+    
+    if missing:
+        print(f"Creating modules: {', '.join(missing)}")
+        now = frappe.utils.now()
+        frappe.db.bulk_insert(
+            "Module Def",
+            ["name", "creation", "modified", "modified_by", "owner",
+             "docstatus", "idx", "module_name", "custom", "app_name"],
+            [(module, now, now, "Administrator", "Administrator", 0, 0, module, 0, "amb_w_spc")
+             for module in missing]
+        )
     
     frappe.db.commit()
     print("✅ All modules created successfully!")